@@ -1,8 +1,10 @@
+import asyncio
 from fastapi import HTTPException, Security
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 import requests
 import os
 from dotenv import load_dotenv
+from .utils.profiling import stage
 
 # Load environment variables
 load_dotenv()
@@ -13,20 +15,23 @@ UNKEY_API_ID = os.getenv("UNKEY_API_ID")
 
 security = HTTPBearer()
 
-async def verify_token(credentials: HTTPAuthorizationCredentials = Security(security)):
-    key = credentials.credentials
-    
+def is_valid_key(key):
+    """Check an API key with Unkey; raises if the service cannot be reached."""
     payload = {
         "apiId": UNKEY_API_ID,
         "key": key
     }
+    with stage("auth"):
+        response = requests.post(UNKEY_API_URL, json=payload)
+    response_data = response.json()
+    return response.status_code == 200 and response_data.get("valid", False)
+
+async def verify_token(credentials: HTTPAuthorizationCredentials = Security(security)):
+    key = credentials.credentials
     
     try:
-        response = requests.post(UNKEY_API_URL, json=payload)
-        response_data = response.json()
-        
-        # Check if the key is valid
-        if response.status_code == 200 and response_data.get("valid", False):
+        # Check if the key is valid; the Unkey call blocks, so keep it off the event loop
+        if await asyncio.to_thread(is_valid_key, key):
             return key
         else:
             raise HTTPException(
@@ -34,6 +39,8 @@ async def verify_token(credentials: HTTPAuthorizationCredentials = Security(secu
                 detail="Invalid authentication token",
                 headers={"WWW-Authenticate": "Bearer"},
             )
+    except HTTPException:
+        raise
     except Exception as e:
         # Handle any exceptions during API call
         raise HTTPException(
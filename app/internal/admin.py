@@ -1,4 +1,13 @@
-from fastapi import APIRouter
+import asyncio
+from fastapi import APIRouter, HTTPException, Query, status
+from fastapi.responses import PlainTextResponse
+from ..utils.admission import admission_stats
+from ..utils.intake import intake_stats
+from ..utils.llm import llm_stats
+from ..utils.query_embeddings import query_embeddings
+from ..utils.read_replica import read_replica
+from ..routers.grievances import categorization_queue
+from ..utils.profiling import request_tracker, sample_stacks, measure_loop_lag
 
 router = APIRouter()
 
@@ -10,3 +19,84 @@ async def update_admin():
 @router.get("/")
 async def read_admin():
     return {"message": "Admin only"}
+
+
+@router.get("/admission")
+async def read_admission_stats():
+    """Rate limiting, queueing and load shedding statistics per admission policy"""
+    return {"status": "success", "policies": admission_stats()}
+
+
+@router.get("/intake")
+async def read_intake_stats():
+    """Sessions, cache hits, upstream queries and pushes of the typing-time suggestions"""
+    return {"status": "success", **intake_stats()}
+
+
+@router.get("/llm")
+async def read_llm_stats():
+    """Token usage and latency of LLM calls per call site and model"""
+    return {"status": "success", **llm_stats()}
+
+
+@router.get("/embeddings")
+async def read_embedding_stats():
+    """Hit rates of the client-side query embedding cache"""
+    return {"status": "success", **query_embeddings.snapshot()}
+
+
+@router.get("/categorization")
+async def read_categorization_stats():
+    """Pending, refused and failed background categorization jobs"""
+    return {"status": "success", **categorization_queue.snapshot()}
+
+
+@router.get("/replica")
+async def read_replica_stats():
+    """Sync state and read counters of the local read replica"""
+    return {"status": "success", **read_replica.snapshot()}
+
+
+@router.post("/profile", response_class=PlainTextResponse)
+async def run_profiler(
+    seconds: float = Query(default=10.0, gt=0, le=120),
+    interval_ms: float = Query(default=5.0, ge=1, le=1000),
+):
+    """
+    Sample all thread stacks for the given number of seconds.
+
+    Returns collapsed stacks (`frame;frame;... count`) for flamegraph tools.
+    """
+    collapsed = await asyncio.to_thread(sample_stacks, seconds, interval_ms / 1000)
+    if collapsed is None:
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail="A profile is already running"
+        )
+    return PlainTextResponse(
+        collapsed,
+        headers={"Content-Disposition": 'attachment; filename="profile.collapsed"'},
+    )
+
+
+@router.get("/loop-lag")
+async def read_loop_lag(seconds: float = Query(default=1.0, gt=0, le=30)):
+    """Measure event-loop scheduling lag over the given number of seconds"""
+    return {"status": "success", **await measure_loop_lag(seconds)}
+
+
+@router.get("/requests/in-flight")
+async def read_in_flight_requests():
+    """Requests currently being processed, oldest first"""
+    requests = request_tracker.in_flight_snapshot()
+    return {"status": "success", "count": len(requests), "requests": requests}
+
+
+@router.get("/requests/slow")
+async def read_slow_requests():
+    """Recent requests slower than SLOW_REQUEST_THRESHOLD_MS, slowest first, with stage timings"""
+    return {
+        "status": "success",
+        "threshold_ms": request_tracker.threshold_ms,
+        "requests": request_tracker.slow_snapshot(),
+    }
@@ -0,0 +1,3 @@
+"""
+Batch jobs for the GRM API, run from the command line.
+"""
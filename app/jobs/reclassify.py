@@ -0,0 +1,459 @@
+"""
+Backfill the reformed categories of historical grievances.
+
+Scans Grievance with cursor pagination for records without
+`reformed_top_level_category`, classifies each description with
+`fetch_category` (the same search the API uses) with up to --concurrency
+searches at once, and writes `reformed_top_level_category`,
+`reformed_last_level_category` and `reformed_flag` back in Xata transactions
+of --chunk-size records.
+
+With --categorize it instead fills in what create_grievance's background
+categorization writes (`classified_category`, `formatted_fields`,
+`category_data`) for records without `classified_category`, e.g. grievances
+whose background job was refused or failed.
+
+Progress is checkpointed to a JSON file after every page has been written, so
+an interrupted run resumes from the last completed page. Search errors (as
+opposed to "no matching category") are retried with exponential backoff; if a
+page still has errors after --retries attempts, the job stops without writing
+that page or moving the checkpoint past it, and exits with status 1.
+Throughput and an ETA are printed every --report-every seconds.
+
+Dry run (no network): classify against a local copy of the category
+collection (see benchmarks.category_eval --export) and write to an in-memory
+Xata stub, seeded from a JSON lines file or with synthetic grievances.
+
+Examples:
+    python -m app.jobs.reclassify --concurrency 32
+    python -m app.jobs.reclassify --categorize
+    python -m app.jobs.reclassify --dry-run --collection categories.json --stub-size 5000
+    python -m app.jobs.reclassify --dry-run --collection categories.json --stub-data grievances.jsonl
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from app.utils.categorization_queue import categorize_grievance_fields
+from app.utils.grievance_utils import fetch_category
+
+TABLE = "Grievance"
+SCAN_COLUMNS = ["id", "title", "description", "cpgrams_category"]
+PENDING_FILTER = {"$notExists": "reformed_top_level_category"}
+CATEGORIZE_PENDING_FILTER = {"$notExists": "classified_category"}
+CATEGORY_LEVELS = ["category"] + [f"sub_category_{i}" for i in range(1, 7)]
+
+
+def reformed_fields(category):
+    """
+    Map a category from `fetch_category` to the reformed Grievance fields.
+
+    The top level is the category's first level and the last level its
+    deepest non-empty sub-category.
+
+    Returns:
+        dict: Fields to write, or None if the category has no levels
+    """
+    levels = [category.get(level) for level in CATEGORY_LEVELS if category.get(level)]
+    if not levels and category.get("concat_grievance_category"):
+        levels = [part.strip() for part in category["concat_grievance_category"].split(">>") if part.strip()]
+    if not levels:
+        return None
+    return {
+        "reformed_top_level_category": levels[0],
+        "reformed_last_level_category": levels[-1],
+        "reformed_flag": True,
+    }
+
+
+def classify(record, collection=None, categorize=False):
+    """Classify one grievance record; returns its reformed (or, with `categorize`, categorization) fields or None."""
+    text = record.get("description") or record.get("title")
+    if not text:
+        return None
+    if categorize:
+        return categorize_grievance_fields(text, target_collection=collection, raise_errors=True)
+    categories = fetch_category(text, target_collection=collection, raise_errors=True)
+    return reformed_fields(categories[0]) if categories else None
+
+
+def load_checkpoint(path):
+    if not os.path.exists(path):
+        return None
+    with open(path) as f:
+        return json.load(f)
+
+
+def save_checkpoint(path, state):
+    # Write to a temporary file and rename, so a crash never leaves a partial checkpoint
+    temporary = f"{path}.tmp"
+    with open(temporary, "w") as f:
+        json.dump(state, f, indent=2)
+    os.replace(temporary, path)
+
+
+class Backfill:
+    """
+    One backfill run over the Grievance table.
+
+    Args:
+        xata: XataClient (or StubXataClient for dry runs)
+        checkpoint_path (str): File progress is saved to and resumed from
+        collection: Category collection to search instead of Weaviate
+        concurrency (int): Classifications running at once
+        page_size (int): Records fetched per Xata query
+        chunk_size (int): Updates per Xata transaction
+        include_classified (bool): Also reclassify records that already have reformed categories
+        limit (int, optional): Stop after this many records
+        report_every (float): Seconds between progress reports
+        retries (int): Retries of a page's failed classifications before stopping
+        retry_backoff (float): Seconds before the first retry, doubled for each further one
+        replica (ReadReplica, optional): Local read replica to write updated records through to
+        categorize (bool): Fill classified_category and related fields instead of the reformed ones
+    """
+
+    def __init__(self, xata, checkpoint_path, collection=None, concurrency=16, page_size=200,
+                 chunk_size=50, include_classified=False, limit=None, report_every=10.0,
+                 retries=3, retry_backoff=2.0, replica=None, categorize=False):
+        self.xata = xata
+        self.checkpoint_path = checkpoint_path
+        self.collection = collection
+        self.concurrency = concurrency
+        self.page_size = page_size
+        self.chunk_size = chunk_size
+        self.include_classified = include_classified
+        self.limit = limit
+        self.report_every = report_every
+        self.retries = retries
+        self.retry_backoff = retry_backoff
+        self.replica = replica
+        self.categorize = categorize
+        # Records whose classification still failed after all retries in this run
+        self.errors = 0
+        self.state = {
+            "include_classified": include_classified,
+            "categorize": categorize,
+            "cursor": None,
+            "done": False,
+            "scanned": 0,
+            "written": 0,
+            "unmatched": 0,
+            "failed_writes": 0,
+            "elapsed_seconds": 0.0,
+            "updated_at": None,
+        }
+        self._run_started = None
+        self._run_scanned = 0
+        self._last_report = 0.0
+        self._total = None
+
+    def resume(self):
+        """Load the checkpoint, if any; returns False if it belongs to a different kind of run."""
+        checkpoint = load_checkpoint(self.checkpoint_path)
+        if checkpoint is None:
+            return True
+        if checkpoint.get("include_classified") != self.include_classified:
+            return False
+        if checkpoint.get("categorize", False) != self.categorize:
+            return False
+        self.state.update(checkpoint)
+        return True
+
+    def _next_page_size(self, fetched):
+        # Never fetch past --limit, so the saved cursor is always after the last processed record
+        if self.limit is None:
+            return self.page_size
+        return min(self.page_size, self.limit - fetched)
+
+    def _filter(self):
+        if self.include_classified:
+            return {}
+        return CATEGORIZE_PENDING_FILTER if self.categorize else PENDING_FILTER
+
+    def _count_remaining(self):
+        # Records matching the scan filter; used for the ETA
+        resp = self.xata.data().aggregate(TABLE, {"aggs": {"total": {"count": "*"}}, "filter": self._filter()})
+        if not resp.is_success():
+            return None
+        return resp.get("aggs", {}).get("total")
+
+    def _fetch_page(self, cursor, size):
+        if cursor:
+            query = {"columns": SCAN_COLUMNS, "page": {"size": size, "after": cursor}}
+        else:
+            query = {
+                "columns": SCAN_COLUMNS,
+                "filter": self._filter(),
+                "sort": [{"id": "asc"}],
+                "page": {"size": size},
+            }
+        resp = self.xata.data().query(TABLE, query)
+        if not resp.is_success():
+            raise RuntimeError(f"Failed to fetch grievances: {resp}")
+        records = resp.get("records", [])
+        more = resp.has_more_results() and bool(records)
+        return records, resp.get_cursor() if more else None
+
+    async def _classify_page(self, records, semaphore):
+        """
+        Classify a page, retrying failed searches with exponential backoff.
+
+        Returns:
+            tuple: ([(grievance id, fields or None)], {grievance id: error} for
+                records that still failed after all retries)
+        """
+        async def classify_one(record):
+            async with semaphore:
+                try:
+                    return record["id"], await asyncio.to_thread(classify, record, self.collection, self.categorize), None
+                except Exception as e:
+                    return record["id"], None, e
+
+        fields_by_id, errors = {}, {}
+        pending = records
+        for attempt in range(self.retries + 1):
+            if attempt:
+                delay = self.retry_backoff * 2 ** (attempt - 1)
+                print(f"{len(pending)} classifications failed ({next(iter(errors.values()))}), retrying in {delay:.1f}s")
+                await asyncio.sleep(delay)
+            errors = {}
+            for grievance_id, fields, error in await asyncio.gather(*[classify_one(r) for r in pending]):
+                if error is None:
+                    fields_by_id[grievance_id] = fields
+                else:
+                    errors[grievance_id] = error
+            pending = [r for r in pending if r["id"] in errors]
+            if not pending:
+                break
+
+        return [(r["id"], fields_by_id.get(r["id"])) for r in records], errors
+
+    def _write_through(self, update):
+        if self.replica is not None:
+            self.replica.update(TABLE, update["id"], update["fields"])
+
+    def _write_chunk(self, updates):
+        current_time = datetime.now().strftime("%Y-%m-%dT%H:%M:%S.%fZ")
+        operations = [
+            {"update": {"table": TABLE, "id": grievance_id, "fields": {**fields, "updated_at": current_time}}}
+            for grievance_id, fields in updates
+        ]
+        resp = self.xata.records().transaction({"operations": operations})
+        if resp.is_success():
+            for operation in operations:
+                self._write_through(operation["update"])
+            return len(operations), 0
+
+        # A transaction fails as a whole, so fall back to per-record updates
+        print(f"Backfill transaction failed, updating records individually: {resp}")
+        written = failed = 0
+        for operation in operations:
+            update = operation["update"]
+            resp = self.xata.records().update(TABLE, update["id"], update["fields"])
+            if resp.is_success():
+                written += 1
+                self._write_through(update)
+            else:
+                failed += 1
+                print(f"Failed to store categories for grievance {update['id']}: {resp}")
+        return written, failed
+
+    def _write_page(self, results):
+        updates = [(grievance_id, fields) for grievance_id, fields in results if fields]
+        written = failed = 0
+        for start in range(0, len(updates), self.chunk_size):
+            chunk_written, chunk_failed = self._write_chunk(updates[start:start + self.chunk_size])
+            written += chunk_written
+            failed += chunk_failed
+        return written, failed
+
+    def _report(self, force=False):
+        now = time.monotonic()
+        if not force and now - self._last_report < self.report_every:
+            return
+        self._last_report = now
+        elapsed = now - self._run_started
+        rate = self._run_scanned / elapsed if elapsed > 0 else 0.0
+        line = (f"scanned {self.state['scanned']} written {self.state['written']} "
+                f"unmatched {self.state['unmatched']} failed {self.state['failed_writes']} | {rate:.1f} records/s")
+        if self._total is not None and rate > 0:
+            remaining = max(0, self._total - self._run_scanned)
+            line += f" | {remaining} left, ETA {remaining / rate / 60:.1f} min"
+        print(line, flush=True)
+
+    async def run(self):
+        """Scan, classify and write until the table (or --limit) is exhausted."""
+        if self.state["done"]:
+            print("Checkpoint says the backfill already finished; use --reset to run it again")
+            return self.state
+
+        # Room for every classification plus the page fetch and write threads
+        asyncio.get_running_loop().set_default_executor(ThreadPoolExecutor(max_workers=self.concurrency + 2))
+        semaphore = asyncio.Semaphore(self.concurrency)
+        self._run_started = self._last_report = time.monotonic()
+        elapsed_before = self.state["elapsed_seconds"]
+
+        if self.state["cursor"] is not None:
+            print(f"Resuming after {self.state['scanned']} scanned grievances")
+        matching = await asyncio.to_thread(self._count_remaining)
+        if matching is not None:
+            # Unmatched records keep matching the pending filter but are already behind the cursor
+            self._total = matching - (self.state["scanned"] if self.include_classified else self.state["unmatched"])
+            if self.limit is not None:
+                self._total = min(self._total, self.limit)
+            print(f"{self._total} grievances to classify")
+
+        # Fetch the next page while the current one is being classified
+        next_page = asyncio.create_task(asyncio.to_thread(self._fetch_page, self.state["cursor"], self._next_page_size(0)))
+        while True:
+            records, cursor = await next_page
+            if not records:
+                self.state["done"] = cursor is None
+                break
+            size = self._next_page_size(self._run_scanned + len(records))
+            if cursor is not None and size > 0:
+                next_page = asyncio.create_task(asyncio.to_thread(self._fetch_page, cursor, size))
+
+            results, errors = await self._classify_page(records, semaphore)
+            if errors:
+                # Leave the checkpoint before this page so a later run retries all of it
+                self.errors += len(errors)
+                grievance_id, error = next(iter(errors.items()))
+                print(f"Stopping: {len(errors)} grievances could not be classified "
+                      f"(e.g. {grievance_id}: {error}); the checkpoint was not moved past this page")
+                break
+
+            written, failed = await asyncio.to_thread(self._write_page, results)
+
+            self._run_scanned += len(records)
+            self.state["scanned"] += len(records)
+            self.state["written"] += written
+            self.state["failed_writes"] += failed
+            self.state["unmatched"] += sum(1 for _, fields in results if not fields)
+            self.state["cursor"] = cursor
+            self.state["elapsed_seconds"] = elapsed_before + time.monotonic() - self._run_started
+            self.state["updated_at"] = datetime.now().isoformat()
+            self.state["done"] = cursor is None
+            save_checkpoint(self.checkpoint_path, self.state)
+            self._report()
+
+            if cursor is None or size <= 0:
+                break
+
+        if not next_page.done():
+            next_page.cancel()
+        save_checkpoint(self.checkpoint_path, self.state)
+        self._report(force=True)
+        return self.state
+
+
+def synthetic_grievances(collection, count, seed=7):
+    """Legacy-style grievances whose descriptions are drawn from category descriptions."""
+    random.seed(seed)
+    descriptions = [o.get("description_of_Grievance_Category") or o.get("concat_Grievance_Category") or ""
+                    for o in collection.objects]
+    descriptions = [d for d in descriptions if d] or ["No description"]
+    return [
+        {
+            "id": f"rec_{i:020d}",
+            "title": f"Legacy grievance {i}",
+            "description": random.choice(descriptions),
+            "cpgrams_category": "Legacy",
+        }
+        for i in range(count)
+    ]
+
+
+def parse_args(argv):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--concurrency", type=int, default=16, help="Classifications running at once")
+    parser.add_argument("--page-size", type=int, default=200, help="Records fetched per Xata query")
+    parser.add_argument("--chunk-size", type=int, default=50, help="Updates per Xata transaction")
+    parser.add_argument("--limit", type=int, help="Stop after this many records")
+    parser.add_argument("--all", action="store_true", help="Also reclassify records that already have categories")
+    parser.add_argument("--categorize", action="store_true",
+                        help="Fill classified_category/formatted_fields/category_data instead of the reformed fields")
+    parser.add_argument("--checkpoint", help="Checkpoint file (default: reclassify_checkpoint[.dry-run].json)")
+    parser.add_argument("--reset", action="store_true", help="Ignore an existing checkpoint and start over")
+    parser.add_argument("--report-every", type=float, default=10.0, help="Seconds between progress reports")
+    parser.add_argument("--retries", type=int, default=3, help="Retries of failed searches before stopping")
+    parser.add_argument("--retry-backoff", type=float, default=2.0, help="Seconds before the first retry, doubled after")
+    parser.add_argument("--dry-run", action="store_true", help="Use a local collection and an in-memory Xata stub")
+    parser.add_argument("--collection", help="Local category collection export (JSON), required for --dry-run")
+    parser.add_argument("--stub-data", help="Grievance records (JSON lines) to seed the stub with")
+    parser.add_argument("--stub-size", type=int, default=1000, help="Synthetic grievances to seed the stub with")
+    args = parser.parse_args(argv)
+    if args.dry_run and not args.collection:
+        parser.error("--collection is required with --dry-run")
+    if args.checkpoint is None:
+        name = "categorize_checkpoint" if args.categorize else "reclassify_checkpoint"
+        args.checkpoint = f"{name}.dry-run.json" if args.dry_run else f"{name}.json"
+    return args
+
+
+def main(argv=None):
+    args = parse_args(argv)
+
+    collection = None
+    replica = None
+    if args.dry_run:
+        from app.utils.local_collection import LocalCategoryCollection
+        from app.utils.xata_stub import StubXataClient
+
+        collection = LocalCategoryCollection.load(args.collection)
+        if args.stub_data:
+            with open(args.stub_data) as f:
+                grievances = [json.loads(line) for line in f if line.strip()]
+        else:
+            grievances = synthetic_grievances(collection, args.stub_size)
+        xata = StubXataClient({TABLE: grievances})
+    else:
+        from xata.client import XataClient
+        from app.utils.read_replica import read_replica
+        xata = XataClient()
+        replica = read_replica
+
+    if args.reset and os.path.exists(args.checkpoint):
+        os.remove(args.checkpoint)
+
+    backfill = Backfill(
+        xata,
+        args.checkpoint,
+        collection=collection,
+        concurrency=args.concurrency,
+        page_size=args.page_size,
+        chunk_size=args.chunk_size,
+        include_classified=args.all,
+        limit=args.limit,
+        report_every=args.report_every,
+        retries=args.retries,
+        retry_backoff=args.retry_backoff,
+        replica=replica,
+        categorize=args.categorize,
+    )
+    if not backfill.resume():
+        print(f"{args.checkpoint} was written by a run with different --all/--categorize; "
+              "use --reset or another --checkpoint")
+        return 1
+
+    state = asyncio.run(backfill.run())
+
+    if args.dry_run:
+        if args.categorize:
+            sample = [r for r in xata.tables[TABLE].values() if r.get("classified_category")][:5]
+            for record in sample:
+                print(f"  {record['id']}: {record['classified_category']}")
+        else:
+            sample = [r for r in xata.tables[TABLE].values() if r.get("reformed_flag")][:5]
+            for record in sample:
+                print(f"  {record['id']}: {record['reformed_top_level_category']} / {record['reformed_last_level_category']}")
+    return 0 if backfill.errors == 0 and state["failed_writes"] == 0 else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
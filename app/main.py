@@ -1,17 +1,31 @@
 from fastapi import FastAPI, Depends
 from fastapi.middleware.cors import CORSMiddleware
 from contextlib import asynccontextmanager
+import asyncio
+import os
 from .dependencies import verify_token
-from .routers import grievances, users, category
+from .middleware import CompressionMiddleware, RequestTrackingMiddleware
+from .routers import grievances, users, category, intake
 from .internal import admin
 from .utils.grievance_utils import disconnect_client
+from .utils.query_embeddings import query_embeddings
+from .utils.read_replica import read_replica
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
-    # Startup: No specific actions needed as client is lazily initialized
+    # Startup: The Weaviate client is lazily initialized; optionally warm the
+    # duplicate index from existing grievances without blocking startup
+    if os.getenv("DUPLICATE_INDEX_WARM", "false").lower() in ("1", "true", "yes"):
+        asyncio.create_task(asyncio.to_thread(grievances.duplicate_index.load_from_xata, grievances.xata))
+    # Keep the optional local read replica in sync with Xata
+    replica_sync = asyncio.create_task(read_replica.run(grievances.xata)) if read_replica.enabled else None
     yield
-    # Shutdown: Disconnect the Weaviate client
+    # Shutdown: Stop the replica sync, then disconnect the Weaviate client
+    if replica_sync is not None:
+        replica_sync.cancel()
     disconnect_client()
+    query_embeddings.close()
+    read_replica.close()
 
 
 app = FastAPI(lifespan=lifespan)
@@ -25,10 +39,20 @@ app.add_middleware(
     allow_headers=["*"],  # Allow all headers
 )
 
+# Compress large JSON responses (gzip, or brotli when installed)
+app.add_middleware(
+    CompressionMiddleware,
+    minimum_size=int(os.getenv("COMPRESSION_MINIMUM_SIZE", "1024")),
+)
+
+# Track in-flight and slow requests for the /admin diagnostics endpoints
+app.add_middleware(RequestTrackingMiddleware)
+
 # Include routers with their dependencies
 app.include_router(users.router)
 app.include_router(grievances.router)
 app.include_router(category.router)
+app.include_router(intake.router)
 app.include_router(
     admin.router,
     prefix="/admin",
@@ -0,0 +1,142 @@
+"""
+ASGI middleware for the GRM API.
+"""
+import asyncio
+import gzip
+from starlette.datastructures import Headers, MutableHeaders
+from .utils.profiling import request_tracker
+
+# Brotli is optional; without it responses are gzip-compressed only
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+COMPRESSIBLE_TYPES = ("application/json", "text/")
+
+
+def _accepted_encodings(accept_encoding):
+    encodings = set()
+    for part in accept_encoding.lower().split(","):
+        name, _, params = part.strip().partition(";")
+        if params.replace(" ", "") in ("q=0", "q=0.0", "q=0.00", "q=0.000"):
+            continue
+        encodings.add(name.strip())
+    return encodings
+
+
+class CompressionMiddleware:
+    """
+    Compress JSON and text responses larger than `minimum_size` bytes.
+
+    Brotli is preferred when the client accepts it and the `brotli` package is
+    installed, otherwise gzip is used. Bodies of `thread_minimum_size` bytes or
+    more are compressed in a worker thread, since gzipping a few hundred KB
+    takes tens of milliseconds. Streaming responses (more than one body chunk)
+    and non-HTTP scopes such as WebSockets are passed through unchanged.
+
+    Starlette's GZipMiddleware is not used because it only speaks gzip, so
+    brotli-capable clients would miss the smaller encoding, and because it
+    matches "gzip" anywhere in Accept-Encoding, compressing for clients that
+    send "gzip;q=0". The versions allowed by requirements.txt also compress
+    every content type, including images and event streams.
+    """
+
+    def __init__(self, app, minimum_size=1024, gzip_level=6, brotli_quality=4, thread_minimum_size=128 * 1024):
+        self.app = app
+        self.minimum_size = minimum_size
+        self.gzip_level = gzip_level
+        self.brotli_quality = brotli_quality
+        self.thread_minimum_size = thread_minimum_size
+
+    def _choose_encoding(self, scope):
+        accepted = _accepted_encodings(Headers(scope=scope).get("accept-encoding", ""))
+        if brotli is not None and "br" in accepted:
+            return "br"
+        if "gzip" in accepted:
+            return "gzip"
+        return None
+
+    def _compress(self, body, encoding):
+        if encoding == "br":
+            return brotli.compress(body, quality=self.brotli_quality)
+        return gzip.compress(body, compresslevel=self.gzip_level)
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        encoding = self._choose_encoding(scope)
+        if encoding is None:
+            await self.app(scope, receive, send)
+            return
+
+        start_message = None
+        passthrough = False
+
+        async def send_wrapper(message):
+            nonlocal start_message, passthrough
+
+            if message["type"] == "http.response.start":
+                start_message = message
+                return
+
+            if message["type"] != "http.response.body" or passthrough or start_message is None:
+                await send(message)
+                return
+
+            headers = MutableHeaders(raw=start_message["headers"])
+            body = message.get("body", b"")
+            compressible = (
+                not message.get("more_body", False)
+                and len(body) >= self.minimum_size
+                and "content-encoding" not in headers
+                and headers.get("content-type", "").startswith(COMPRESSIBLE_TYPES)
+            )
+
+            if compressible:
+                if len(body) >= self.thread_minimum_size:
+                    body = await asyncio.to_thread(self._compress, body, encoding)
+                else:
+                    body = self._compress(body, encoding)
+                headers["Content-Encoding"] = encoding
+                headers["Content-Length"] = str(len(body))
+                headers.add_vary_header("Accept-Encoding")
+                message = {**message, "body": body}
+
+            passthrough = True
+            await send(start_message)
+            await send(message)
+
+        await self.app(scope, receive, send_wrapper)
+
+
+class RequestTrackingMiddleware:
+    """
+    Register each HTTP request with the request tracker while it runs, so it
+    appears in the in-flight list and, if slow, in the slow-request buffer.
+    """
+
+    def __init__(self, app, tracker=request_tracker):
+        self.app = app
+        self.tracker = tracker
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        request_id = self.tracker.start(scope["method"], scope["path"])
+        status_code = 500
+
+        async def send_wrapper(message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            self.tracker.finish(request_id, status_code)
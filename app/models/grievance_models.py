@@ -76,6 +76,7 @@ class Grievance(GrievanceBase):
     missing_information: Optional[bool] = None
     is_correct_category: Optional[bool] = None
     category_data: Optional[dict] = None
+    follow_up_session: Optional[dict] = None
 
 
 class FollowUpQuestions(BaseModel):
@@ -113,4 +114,104 @@ class FAQItem(BaseModel):
 class FAQResponse(BaseModel):
     status: str
     faqs: List[FAQItem]
-    count: int
\ No newline at end of file
+    count: int
+
+
+class CategoryMatch(BaseModel):
+    rank: int
+    score: Optional[float] = None
+    rerank_score: Optional[float] = None
+    id: Optional[str] = None
+    concat_grievance_category: Optional[str] = None
+    content: Optional[str] = None
+    department_code: Optional[str] = None
+    department_name: Optional[str] = None
+    category: Optional[str] = None
+    sub_category_1: Optional[str] = None
+    sub_category_2: Optional[str] = None
+    sub_category_3: Optional[str] = None
+    sub_category_4: Optional[str] = None
+    sub_category_5: Optional[str] = None
+    sub_category_6: Optional[str] = None
+    description_of_grievance_category: Optional[str] = None
+    gpt_form_field_generation: Optional[str] = None
+
+
+class CategorizeResponse(BaseModel):
+    status: str
+    categories: List[CategoryMatch]
+    top_category: Optional[CategoryMatch] = None
+    formatted_fields: str = ""
+    classified_category: str = ""
+
+
+class AssistRequest(BaseModel):
+    grievance_text: str
+    faq_limit: int = Field(default=5, description="Maximum number of FAQ items to return")
+
+
+class AssistTimings(BaseModel):
+    category_ms: float
+    faq_ms: float
+    total_ms: float
+
+
+class AssistResponse(BaseModel):
+    status: str
+    categories: List[CategoryMatch]
+    top_category: Optional[CategoryMatch] = None
+    formatted_fields: str = ""
+    classified_category: str = ""
+    category_reused: bool = False
+    faqs: List[FAQItem]
+    faq_count: int
+    timings: AssistTimings
+
+
+class OpenQuestionVerification(BaseModel):
+    answered_question_numbers: List[int] = Field(
+        default_factory=list,
+        description="Numbers of the listed questions that the new answer fully answers",
+    )
+
+
+class FollowUpQuestionState(BaseModel):
+    question: str
+    answered: bool = False
+    answer: Optional[str] = None
+
+
+class FollowUpSession(BaseModel):
+    grievance_id: str
+    questions: List[FollowUpQuestionState] = Field(default_factory=list)
+    turns: int = 0
+
+    @property
+    def open_questions(self) -> List[FollowUpQuestionState]:
+        return [q for q in self.questions if not q.answered]
+
+    @property
+    def complete(self) -> bool:
+        return not self.open_questions
+
+
+class FollowUpSessionResponse(BaseModel):
+    status: str
+    grievance_id: str
+    turns: int
+    complete: bool
+    open_questions: List[str]
+    answered_questions: List[FollowUpQuestionState]
+    newly_answered: List[str] = Field(default_factory=list)
+
+
+# Grievance columns that list endpoints can project
+GRIEVANCE_COLUMNS = [name for name in Grievance.model_fields if name != "id"]
+
+
+class OfficerQueueResponse(BaseModel):
+    status: str
+    grievances: List[dict]
+    size: int
+    next_cursor: Optional[str] = None
+    took_ms: float
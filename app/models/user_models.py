@@ -1,4 +1,5 @@
-from pydantic import BaseModel, field_validator
+from pydantic import BaseModel, Field, field_validator
+from typing import Dict, List, Optional
 import re
 
 class UserBase(BaseModel):
@@ -31,3 +32,34 @@ class UserCreate(UserBase):
         if not re.match(r'^[a-zA-Z0-9._%+-]+@[a-zA-Z0-9.-]+\.[a-zA-Z]{2,}$', v):
             raise ValueError('Invalid email format')
         return v
+
+
+# Columns of the Users table that can be filtered on and projected
+USER_COLUMNS = ["Name", "Email", "State", "Gender", "District", "Mobile"]
+
+
+class UserBatchRequest(BaseModel):
+    ids: List[str] = Field(..., min_length=1, max_length=500)
+    columns: Optional[List[str]] = None
+
+    @field_validator('columns')
+    @classmethod
+    def validate_columns(cls, v):
+        if v is not None:
+            unknown = [c for c in v if c not in USER_COLUMNS]
+            if unknown:
+                raise ValueError(f"Unknown columns: {', '.join(unknown)}")
+        return v
+
+
+class UserBatchResponse(BaseModel):
+    status: str
+    users: Dict[str, dict]
+    missing: List[str]
+
+
+class UserSearchResponse(BaseModel):
+    status: str
+    users: List[dict]
+    size: int
+    next_cursor: Optional[str] = None
@@ -1,7 +1,52 @@
+import asyncio
+import hashlib
+import os
+import time
 from fastapi import APIRouter, Depends, HTTPException, status
 from ..dependencies import verify_token
 from ..utils.grievance_utils import process_grievance_category, fetch_faqs
-from ..models.grievance_models import GrievanceCategoryRequest, FAQRequest, FAQResponse
+from ..utils.duplicate_index import DuplicateIndex, minhash_signature, normalize_text
+from ..utils.admission import AdmissionPolicy
+from ..models.grievance_models import (
+    GrievanceCategoryRequest,
+    FAQRequest,
+    FAQResponse,
+    CategorizeResponse,
+    AssistRequest,
+    AssistResponse,
+)
+
+# Recent categorization results, reused for near-identical grievance texts;
+# entries expire so changes to the category collection are picked up
+category_result_index = DuplicateIndex(
+    threshold=float(os.getenv("CATEGORY_REUSE_THRESHOLD", "0.9")),
+    max_documents=int(os.getenv("CATEGORY_REUSE_MAX_DOCUMENTS", "5000")),
+    ttl=float(os.getenv("CATEGORY_REUSE_TTL_SECONDS", "900")),
+)
+
+# Admission control: categorization is the expensive path (Weaviate + reranker)
+category_admission = AdmissionPolicy.from_env("category", "CATEGORY_ADMISSION")
+faq_admission = AdmissionPolicy.from_env("faq", "FAQ_ADMISSION", rate=5.0, burst=20, max_concurrent=16)
+
+
+async def _categorize(grievance_text):
+    """Reuse the result of a near-identical text, otherwise categorize it; returns (info, reused)."""
+    signature = await asyncio.to_thread(minhash_signature, grievance_text)
+    duplicate = category_result_index.find_duplicate(grievance_text, signature=signature)
+    if duplicate is not None:
+        return duplicate["payload"], True
+    category_info = await asyncio.to_thread(process_grievance_category, grievance_text)
+    if category_info.get('top_category') is not None:
+        doc_id = hashlib.sha1(normalize_text(grievance_text).encode()).hexdigest()
+        category_result_index.add(doc_id, grievance_text, payload=category_info, signature=signature)
+    return category_info, False
+
+
+async def _timed(coroutine):
+    started = time.perf_counter()
+    result = await coroutine
+    return result, (time.perf_counter() - started) * 1000
+
 
 # Request model is now imported from grievance_models.py
 # Define the router with authentication dependency
@@ -12,7 +57,7 @@ router = APIRouter(
     responses={404: {"description": "Not found"}},
 )
 
-@router.post("/", response_model=dict)
+@router.post("/", response_model=CategorizeResponse, dependencies=[Depends(category_admission)])
 async def categorize_grievance(request: GrievanceCategoryRequest):
     """
     Categorize a grievance text and return category information.
@@ -24,8 +69,7 @@ async def categorize_grievance(request: GrievanceCategoryRequest):
     - Classified category path
     """
     try:
-        # Process the grievance text to get category information
-        category_info = process_grievance_category(request.grievance_text)
+        category_info, _ = await _categorize(request.grievance_text)
         
         # Return the category information
         return {
@@ -43,7 +87,7 @@ async def categorize_grievance(request: GrievanceCategoryRequest):
         )
 
 
-@router.post("/faq", response_model=FAQResponse)
+@router.post("/faq", response_model=FAQResponse, dependencies=[Depends(faq_admission)])
 async def get_faq_information(request: FAQRequest):
     """
     Retrieve FAQ information based on a search query.
@@ -56,7 +100,7 @@ async def get_faq_information(request: FAQRequest):
     """
     try:
         # Fetch FAQ items based on the query
-        faq_items = fetch_faqs(request.query, request.limit)
+        faq_items = await asyncio.to_thread(fetch_faqs, request.query, request.limit)
         
         # Return the FAQ information
         return {
@@ -69,4 +113,48 @@ async def get_faq_information(request: FAQRequest):
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail=str(e)
-        )
\ No newline at end of file
+        )
+
+
+@router.post(
+    "/assist",
+    response_model=AssistResponse,
+    dependencies=[Depends(category_admission), Depends(faq_admission)],
+)
+async def assist_grievance(request: AssistRequest):
+    """
+    Categorize a grievance text and find matching FAQs in one request.
+
+    The category and FAQ searches run concurrently, so the response takes as
+    long as the slower of the two rather than their sum. `timings` reports
+    each part and the total in milliseconds.
+    """
+    try:
+        started = time.perf_counter()
+        (category_result, category_ms), (faq_items, faq_ms) = await asyncio.gather(
+            _timed(_categorize(request.grievance_text)),
+            _timed(asyncio.to_thread(fetch_faqs, request.grievance_text, request.faq_limit)),
+        )
+        category_info, reused = category_result
+
+        return {
+            "status": "success",
+            "categories": category_info.get('categories', []),
+            "top_category": category_info.get('top_category'),
+            "formatted_fields": category_info.get('formatted_fields', ""),
+            "classified_category": category_info.get('classified_category', ""),
+            "category_reused": reused,
+            "faqs": faq_items,
+            "faq_count": len(faq_items),
+            "timings": {
+                "category_ms": round(category_ms, 2),
+                "faq_ms": round(faq_ms, 2),
+                "total_ms": round((time.perf_counter() - started) * 1000, 2),
+            },
+        }
+
+    except Exception as e:
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=str(e)
+        )
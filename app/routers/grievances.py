@@ -1,13 +1,41 @@
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, BackgroundTasks, Depends, Header, HTTPException, Query, Response, status
+import asyncio
+import time
+from typing import List, Literal, Optional
 from ..dependencies import verify_token
-from datetime import datetime
+from datetime import datetime, timedelta
 from xata.client import XataClient
 from dotenv import load_dotenv
-from ..models.grievance_models import GrievanceCreate, GrievanceUpdate, STATUS_OPTIONS
+from ..models.grievance_models import (
+    GrievanceCreate,
+    GrievanceUpdate,
+    FollowUpResponse,
+    FollowUpSessionResponse,
+    OfficerQueueResponse,
+    STATUS_OPTIONS,
+    GRIEVANCE_COLUMNS,
+)
+from ..utils.admission import AdmissionPolicy
+from ..utils.categorization_queue import CategorizationQueue
+from ..utils.duplicate_index import DuplicateIndex, minhash_signature
+from ..utils.follow_up_sessions import FollowUpSessionStore
+from ..utils.idempotency import idempotency_store, request_fingerprint
+from ..utils.read_replica import read_replica
 
 
 load_dotenv()
 xata = XataClient()
+categorization_queue = CategorizationQueue(xata)
+duplicate_index = DuplicateIndex()
+follow_up_sessions = FollowUpSessionStore(xata)
+
+# Admission control: starting and answering follow-ups call Weaviate and the LLM
+follow_up_admission = AdmissionPolicy.from_env("follow_up", "FOLLOW_UP_ADMISSION", rate=1.0, burst=5)
+
+# Columns returned by the officer queue when none are requested
+QUEUE_DEFAULT_COLUMNS = ["title", "status", "priority", "cpgrams_category", "grievance_received_date", "user_id"]
+# New grievances are created with status "pending", which is not in STATUS_OPTIONS
+QUEUE_STATUSES = STATUS_OPTIONS + ["pending"]
 
 router = APIRouter(
     prefix="/grievances",
@@ -18,9 +46,35 @@ router = APIRouter(
 
 
 @router.post("/", response_model=dict, status_code=status.HTTP_201_CREATED)
-async def create_grievance(grievance: GrievanceCreate):
-    """Create a new grievance in the Xata database with only required fields"""
-    
+async def create_grievance(
+    grievance: GrievanceCreate,
+    response: Response,
+    background_tasks: BackgroundTasks,
+    api_key: str = Depends(verify_token),
+    idempotency_key: Optional[str] = Header(default=None, alias="Idempotency-Key"),
+):
+    """
+    Create a new grievance in the Xata database with only required fields.
+
+    With an `Idempotency-Key` header, retries of the same request return the
+    original response (marked `Idempotent-Replayed: true`) instead of creating
+    another grievance.
+    """
+    if idempotency_key is None:
+        return await _insert_grievance(grievance, background_tasks)
+
+    result, replayed = await idempotency_store.run(
+        (api_key, "create_grievance"),
+        idempotency_key,
+        request_fingerprint("create_grievance", grievance.model_dump()),
+        lambda: _insert_grievance(grievance, background_tasks),
+    )
+    if replayed:
+        response.headers["Idempotent-Replayed"] = "true"
+    return result
+
+
+async def _insert_grievance(grievance: GrievanceCreate, background_tasks: BackgroundTasks):
     try:
         user_data = xata.records().get("Users", grievance.user_id)
         if not user_data.is_success():
@@ -56,6 +110,11 @@ async def create_grievance(grievance: GrievanceCreate):
         if grievance.reformed_flag is not None:
             grievance_data["reformed_flag"] = grievance.reformed_flag
 
+        # Look for a near-duplicate from the same user (or anyone) before inserting;
+        # the signature is computed once, off the event loop, for both lookup and indexing
+        signature = await asyncio.to_thread(minhash_signature, grievance.description)
+        duplicate = duplicate_index.find_duplicate(grievance.description, grievance.user_id, signature=signature)
+
         # Insert the grievance with all the state information
         resp = xata.records().insert("Grievance", grievance_data)
         if not resp.is_success():
@@ -64,6 +123,15 @@ async def create_grievance(grievance: GrievanceCreate):
                 status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
                 detail="Failed to create grievance",            
             )
+
+        duplicate_index.add(resp["id"], grievance.description, grievance.user_id, signature=signature)
+        read_replica.upsert("Grievance", [{**grievance_data, "id": resp["id"], "user_id": {"id": grievance.user_id}}])
+
+        # Categorize after the response is sent so the create path does not wait on it;
+        # a duplicate reuses the original's categorization when it is available
+        categorization_queued = categorization_queue.schedule(
+            background_tasks, resp["id"], grievance.description, duplicate_of=duplicate["id"] if duplicate else None
+        )
             
         # Prepare the response with all relevant information
         response_data = {
@@ -74,6 +142,9 @@ async def create_grievance(grievance: GrievanceCreate):
             "priority": grievance.priority,
             "user_id": grievance.user_id,
             "cpgrams_category": grievance.cpgrams_category,
+            "categorization_queued": categorization_queued,
+            "likely_duplicate_of": duplicate["id"] if duplicate else None,
+            "duplicate_scope": duplicate["scope"] if duplicate else None,
         }
         return response_data
         
@@ -84,10 +155,102 @@ async def create_grievance(grievance: GrievanceCreate):
         )
 
 
+@router.get("/queue", response_model=OfficerQueueResponse)
+async def get_officer_queue(
+    status_filter: Optional[List[str]] = Query(default=None, alias="status"),
+    priority: Optional[List[str]] = Query(default=None),
+    cpgrams_category: Optional[str] = None,
+    min_age_days: Optional[int] = Query(default=None, ge=0, description="Only grievances received at least this many days ago"),
+    max_age_days: Optional[int] = Query(default=None, ge=0, description="Only grievances received at most this many days ago"),
+    order: Literal["asc", "desc"] = Query(default="asc", description="asc lists the oldest grievances first"),
+    columns: Optional[str] = Query(default=None, description="Comma-separated columns to return"),
+    size: int = Query(default=50, ge=1, le=200),
+    cursor: Optional[str] = Query(default=None, description="next_cursor from the previous page"),
+):
+    """
+    List grievances for officers, sorted by received date, with cursor pagination.
+
+    Filters apply to the first page; pass the returned `next_cursor` (with the
+    same columns) to continue. Cursor pages seek from the last returned row,
+    so page 500 costs the same as page 1.
+    """
+    invalid_statuses = [s for s in status_filter or [] if s not in QUEUE_STATUSES]
+    if invalid_statuses:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Invalid status. Must be one of: {', '.join(QUEUE_STATUSES)}"
+        )
+
+    selected = columns.split(",") if columns else QUEUE_DEFAULT_COLUMNS
+    unknown = [c for c in selected if c not in GRIEVANCE_COLUMNS]
+    if unknown:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Unknown columns: {', '.join(unknown)}"
+        )
+
+    try:
+        query = {"columns": ["id"] + selected, "page": {"size": size}}
+        if cursor:
+            # Xata cursors already encode the filter and sort of the first page
+            query["page"]["after"] = cursor
+        else:
+            filters = {}
+            if status_filter:
+                filters["status"] = {"$any": status_filter}
+            if priority:
+                filters["priority"] = {"$any": priority}
+            if cpgrams_category is not None:
+                filters["cpgrams_category"] = cpgrams_category
+
+            received = {}
+            now = datetime.now()
+            if min_age_days is not None:
+                received["$le"] = (now - timedelta(days=min_age_days)).strftime("%Y-%m-%dT%H:%M:%S.%fZ")
+            if max_age_days is not None:
+                received["$ge"] = (now - timedelta(days=max_age_days)).strftime("%Y-%m-%dT%H:%M:%S.%fZ")
+            if received:
+                filters["grievance_received_date"] = received
+
+            query["filter"] = filters
+            query["sort"] = [{"grievance_received_date": order}, {"id": order}]
+
+        started = time.perf_counter()
+        resp = xata.data().query("Grievance", query)
+        took_ms = (time.perf_counter() - started) * 1000
+        if not resp.is_success():
+            raise HTTPException(
+                status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+                detail="Failed to fetch grievance queue"
+            )
+
+        return {
+            "status": "success",
+            "grievances": resp.get("records", []),
+            "size": size,
+            "next_cursor": resp.get_cursor() if resp.has_more_results() else None,
+            "took_ms": took_ms,
+        }
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=str(e)
+        )
+
+
 @router.get("/{grievance_id}", response_model=dict)
 async def get_grievance(grievance_id: str):
     """Get a grievance by its ID"""
     try:
+        replicated = read_replica.get("Grievance", grievance_id)
+        if replicated is not None:
+            return {
+                "status": "success",
+                "grievance": replicated
+            }
+
         resp = xata.records().get("Grievance", grievance_id)
         if not resp.is_success():
             raise HTTPException(
@@ -107,6 +270,86 @@ async def get_grievance(grievance_id: str):
 
 
 
+def _session_response(session, newly_answered=None):
+    return {
+        "status": "success",
+        "grievance_id": session.grievance_id,
+        "turns": session.turns,
+        "complete": session.complete,
+        "open_questions": [q.question for q in session.open_questions],
+        "answered_questions": [q for q in session.questions if q.answered],
+        "newly_answered": newly_answered or [],
+    }
+
+
+@router.post("/{grievance_id}/follow-up", response_model=FollowUpSessionResponse, dependencies=[Depends(follow_up_admission)])
+async def start_follow_up(grievance_id: str, restart: bool = False):
+    """Start or resume the follow-up question session for a grievance"""
+    try:
+        async with follow_up_sessions.lock(grievance_id):
+            session = await asyncio.to_thread(follow_up_sessions.start, grievance_id, restart)
+        return _session_response(session)
+
+    except LookupError as e:
+        follow_up_sessions.discard_lock(grievance_id)
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=str(e)
+        )
+    except Exception as e:
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=str(e)
+        )
+
+
+@router.get("/{grievance_id}/follow-up", response_model=FollowUpSessionResponse)
+async def get_follow_up(grievance_id: str):
+    """Get the current state of a grievance's follow-up session"""
+    try:
+        session = await asyncio.to_thread(follow_up_sessions.get, grievance_id)
+        if session is None:
+            raise LookupError("No follow-up session for this grievance")
+        return _session_response(session)
+
+    except LookupError as e:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=str(e)
+        )
+    except Exception as e:
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=str(e)
+        )
+
+
+@router.post(
+    "/{grievance_id}/follow-up/answers",
+    response_model=FollowUpSessionResponse,
+    dependencies=[Depends(follow_up_admission)],
+)
+async def answer_follow_up(grievance_id: str, response: FollowUpResponse):
+    """Submit a new answer; only the still-open questions are checked against it"""
+    try:
+        async with follow_up_sessions.lock(grievance_id):
+            session, newly_answered = await asyncio.to_thread(
+                follow_up_sessions.answer, grievance_id, response.additional_information
+            )
+        return _session_response(session, newly_answered)
+
+    except LookupError as e:
+        follow_up_sessions.discard_lock(grievance_id)
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=str(e)
+        )
+    except Exception as e:
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=str(e)
+        )
+
 @router.put("/{grievance_id}", response_model=dict)
 async def update_grievance_status(grievance_id: str, update_data: GrievanceUpdate):
     """Update the status of a grievance"""
@@ -145,6 +388,7 @@ async def update_grievance_status(grievance_id: str, update_data: GrievanceUpdat
                 status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
                 detail="Failed to update grievance"
             )
+        read_replica.update("Grievance", grievance_id, update_fields)
             
         return {
             "id": grievance_id,
@@ -163,6 +407,10 @@ async def update_grievance_status(grievance_id: str, update_data: GrievanceUpdat
 async def get_user_grievances(user_id: str, fetch_all: bool = True, page: int = 1, size: int = 10):
     """Get all grievances linked to a specific user ID"""
     try:
+        replicated = _user_grievances_from_replica(user_id, fetch_all, page, size)
+        if replicated is not None:
+            return replicated
+
         # Check if user exists
         user_data = xata.records().get("Users", user_id)
         if not user_data.is_success():
@@ -261,4 +509,30 @@ async def get_user_grievances(user_id: str, fetch_all: bool = True, page: int =
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail=str(e)
-        )
\ No newline at end of file
+        )
+
+
+def _user_grievances_from_replica(user_id: str, fetch_all: bool, page: int, size: int):
+    # None when the replica cannot answer (disabled, stale or unknown user)
+    if read_replica.get("Users", user_id) is None or not read_replica.is_fresh("Grievance"):
+        return None
+
+    if fetch_all:
+        records = read_replica.find_by_user("Grievance", user_id)
+    else:
+        records = read_replica.find_by_user("Grievance", user_id, offset=(page - 1) * size, limit=size)
+    total_count = read_replica.count_by_user("Grievance", user_id)
+
+    response = {
+        "status": "success",
+        "user_id": user_id,
+        "grievances": records,
+        "total": total_count
+    }
+    if not fetch_all:
+        response.update({
+            "page": page,
+            "size": size,
+            "totalPages": (total_count + size - 1) // size if size > 0 else 0
+        })
+    return response
@@ -0,0 +1,76 @@
+import asyncio
+import json
+from fastapi import APIRouter, WebSocket, WebSocketDisconnect, status
+from ..dependencies import is_valid_key
+from ..utils import intake
+from ..utils.intake import IntakeSession, INTAKE_MAX_SESSIONS, INTAKE_MAX_SESSIONS_PER_KEY
+from .category import category_admission, faq_admission
+
+# WebSocket routes cannot use the HTTPBearer dependency, so the key is checked in the handler
+router = APIRouter(
+    prefix="/intake",
+    tags=["intake"],
+)
+
+
+def _websocket_key(websocket: WebSocket):
+    authorization = websocket.headers.get("authorization", "")
+    scheme, _, credentials = authorization.partition(" ")
+    if scheme.lower() == "bearer" and credentials:
+        return credentials
+    return None
+
+
+@router.websocket("/ws")
+async def intake_suggestions(websocket: WebSocket):
+    """
+    Suggest categories, form fields and FAQs while a grievance is being typed.
+
+    Authenticate with an `Authorization: Bearer` header. Each upstream lookup
+    is charged to the key's category or FAQ rate limit, and a key may keep at
+    most INTAKE_MAX_SESSIONS_PER_KEY sessions open. The client sends `{"text": "<full text>"}` or
+    `{"append": "<new text>"}` as the user types; the server replies with
+    `{"type": "categories", ...}` and `{"type": "faqs", ...}` messages whenever
+    the suggested ranking changes.
+    """
+    key = _websocket_key(websocket)
+    try:
+        valid = bool(key) and await asyncio.to_thread(is_valid_key, key)
+    except Exception as e:
+        print(f"Intake authentication failed: {e}")
+        await websocket.close(code=status.WS_1011_INTERNAL_ERROR, reason="Authentication service error")
+        return
+    if not valid:
+        await websocket.close(code=status.WS_1008_POLICY_VIOLATION, reason="Invalid authentication token")
+        return
+    if intake.active_sessions >= INTAKE_MAX_SESSIONS:
+        await websocket.close(code=status.WS_1013_TRY_AGAIN_LATER, reason="Too many intake sessions")
+        return
+    if intake.sessions_by_key.get(key, 0) >= INTAKE_MAX_SESSIONS_PER_KEY:
+        await websocket.close(code=status.WS_1008_POLICY_VIOLATION, reason="Too many intake sessions for this key")
+        return
+
+    # Count the session before the first await so concurrent connects see it
+    session = IntakeSession(
+        websocket.send_json, key=key,
+        admission={"categories": category_admission, "faqs": faq_admission},
+    )
+    try:
+        await websocket.accept()
+        while True:
+            try:
+                message = json.loads(await websocket.receive_text())
+            except json.JSONDecodeError:
+                await websocket.send_json({"type": "error", "detail": "Messages must be JSON"})
+                continue
+
+            if isinstance(message, dict) and isinstance(message.get("text"), str):
+                session.update(message["text"])
+            elif isinstance(message, dict) and isinstance(message.get("append"), str):
+                session.update(session.text + message["append"])
+            else:
+                await websocket.send_json({"type": "error", "detail": 'Expected {"text": ...} or {"append": ...}'})
+    except WebSocketDisconnect:
+        pass
+    finally:
+        await session.close()
@@ -1,8 +1,18 @@
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, Header, HTTPException, Query, Response, status
+from typing import Optional
 from ..dependencies import verify_token
+from ..utils.idempotency import idempotency_store, request_fingerprint
+from ..utils.read_replica import read_replica
 from xata.client import XataClient
 from dotenv import load_dotenv
-from ..models.user_models import UserResponse, UserCreate
+from ..models.user_models import (
+    UserResponse,
+    UserCreate,
+    UserBatchRequest,
+    UserBatchResponse,
+    UserSearchResponse,
+    USER_COLUMNS,
+)
 
 load_dotenv()
 xata = XataClient()
@@ -14,11 +24,39 @@ router = APIRouter(
     responses={404: {"description": "Not found"}},
 )
 
+# Maximum number of IDs resolved per Xata query in a batch lookup
+BATCH_QUERY_SIZE = 100
+
 
 @router.post("/", response_model=UserResponse, status_code=status.HTTP_201_CREATED)
-async def create_user(user: UserCreate):
-    """Create a new user in the Xata database with validation"""
+async def create_user(
+    user: UserCreate,
+    response: Response,
+    api_key: str = Depends(verify_token),
+    idempotency_key: Optional[str] = Header(default=None, alias="Idempotency-Key"),
+):
+    """
+    Create a new user in the Xata database with validation.
+
+    With an `Idempotency-Key` header, retries of the same request return the
+    original response (marked `Idempotent-Replayed: true`) instead of creating
+    another user.
+    """
+    if idempotency_key is None:
+        return await _insert_user(user)
+
+    result, replayed = await idempotency_store.run(
+        (api_key, "create_user"),
+        idempotency_key,
+        request_fingerprint("create_user", user.model_dump()),
+        lambda: _insert_user(user),
+    )
+    if replayed:
+        response.headers["Idempotent-Replayed"] = "true"
+    return result
+
 
+async def _insert_user(user: UserCreate):
     try:
        resp = xata.records().insert("Users", {
         "Name": user.Name,
@@ -29,6 +67,7 @@ async def create_user(user: UserCreate):
         "Mobile": user.Mobile
        })
        assert resp.is_success()
+       read_replica.upsert("Users", [{**user.model_dump(), "id": resp["id"]}])
        return {"id": resp["id"], "status": "User created successfully"}
     except Exception as e:
         raise HTTPException(
@@ -37,17 +76,113 @@ async def create_user(user: UserCreate):
         )
 
 
+@router.post("/batch", response_model=UserBatchResponse)
+async def get_users_batch(request: UserBatchRequest):
+    """Resolve many user IDs at once, returned as a map of ID to user"""
+    try:
+        ids = list(dict.fromkeys(request.ids))
+        columns = ["id"] + (request.columns or USER_COLUMNS)
+        users = {}
+
+        for start in range(0, len(ids), BATCH_QUERY_SIZE):
+            chunk = ids[start:start + BATCH_QUERY_SIZE]
+            resp = xata.data().query("Users", {
+                "columns": columns,
+                "filter": {"id": {"$any": chunk}},
+                "page": {"size": len(chunk)},
+            })
+            if not resp.is_success():
+                raise HTTPException(
+                    status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+                    detail="Failed to fetch users"
+                )
+            for record in resp.get("records", []):
+                users[record["id"]] = {c: record.get(c, "") for c in columns}
+
+        return {
+            "status": "success",
+            "users": users,
+            "missing": [user_id for user_id in ids if user_id not in users],
+        }
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=str(e)
+        )
+
+
+@router.get("/search", response_model=UserSearchResponse)
+async def search_users(
+    State: Optional[str] = None,
+    District: Optional[str] = None,
+    Mobile: Optional[str] = None,
+    Gender: Optional[str] = None,
+    Email: Optional[str] = None,
+    columns: Optional[str] = Query(default=None, description="Comma-separated columns to return"),
+    size: int = Query(default=20, ge=1, le=200),
+    cursor: Optional[str] = Query(default=None, description="next_cursor from the previous page"),
+):
+    """
+    Search users by exact column values with cursor (keyset) pagination.
+
+    Pass the returned `next_cursor` with the same filters and columns to get
+    the next page; each page costs the same regardless of how deep it is.
+    """
+    selected = columns.split(",") if columns else USER_COLUMNS
+    unknown = [c for c in selected if c not in USER_COLUMNS]
+    if unknown:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Unknown columns: {', '.join(unknown)}. Must be from: {', '.join(USER_COLUMNS)}"
+        )
+
+    try:
+        query = {"columns": ["id"] + selected, "page": {"size": size}}
+        if cursor:
+            # Xata cursors already encode the filter and sort of the first page
+            query["page"]["after"] = cursor
+        else:
+            filters = {"State": State, "District": District, "Mobile": Mobile, "Gender": Gender, "Email": Email}
+            query["filter"] = {column: value for column, value in filters.items() if value is not None}
+            query["sort"] = [{"id": "asc"}]
+
+        resp = xata.data().query("Users", query)
+        if not resp.is_success():
+            raise HTTPException(
+                status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+                detail="Failed to search users"
+            )
+
+        return {
+            "status": "success",
+            "users": [{c: record.get(c, "") for c in ["id"] + selected} for record in resp.get("records", [])],
+            "size": size,
+            "next_cursor": resp.get_cursor() if resp.has_more_results() else None,
+        }
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=str(e)
+        )
+
+
 @router.get("/{user_id}", response_model=dict)
 async def get_user(user_id: str):
     """Get a user by ID from the Xata database"""
     
     try:
-        user_data = xata.records().get("Users", user_id)
-        if not user_data.is_success():
-            raise HTTPException(
-                status_code=status.HTTP_404_NOT_FOUND,
-                detail="User not found"
-            )
+        user_data = read_replica.get("Users", user_id)
+        if user_data is None:
+            user_data = xata.records().get("Users", user_id)
+            if not user_data.is_success():
+                raise HTTPException(
+                    status_code=status.HTTP_404_NOT_FOUND,
+                    detail="User not found"
+                )
             
         return {
             "id": user_id,
@@ -0,0 +1,191 @@
+"""
+Admission control for expensive endpoints.
+
+Each AdmissionPolicy combines a per-API-key token bucket with a per-route
+concurrency cap and a bounded wait queue. Requests over the rate limit get
+429 and requests that cannot be queued (or wait too long) get 503, both with a
+Retry-After header, before any upstream work is done.
+"""
+import asyncio
+import math
+import os
+import time
+from collections import OrderedDict
+from fastapi import Depends, HTTPException, status
+from dotenv import load_dotenv
+from ..dependencies import verify_token
+from .profiling import stage
+
+# Load environment variables
+load_dotenv()
+
+# All policies by name, used for the admin statistics endpoint
+policies = {}
+
+
+class TokenBucket:
+    """Token bucket refilled continuously at `rate` tokens per second up to `capacity`."""
+
+    def __init__(self, rate, capacity):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.monotonic()
+
+    def try_acquire(self):
+        """
+        Take one token if available.
+
+        Returns:
+            float: 0 if a token was taken, otherwise seconds until one is available
+        """
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        if self.tokens >= 1:
+            self.tokens -= 1
+            return 0.0
+        return (1 - self.tokens) / self.rate if self.rate > 0 else 60.0
+
+
+class AdmissionPolicy:
+    """
+    Rate limit, concurrency cap and wait queue for one group of routes.
+
+    Args:
+        name (str): Name reported in statistics
+        rate (float): Sustained requests per second allowed per API key
+        burst (int): Bucket capacity, i.e. requests a key may make at once
+        max_concurrent (int): Requests allowed to run at the same time
+        max_queue (int): Requests allowed to wait for a free slot
+        queue_timeout (float): Seconds a queued request waits before being shed
+        max_keys (int): Token buckets kept in memory, least recently used evicted
+    """
+
+    def __init__(self, name, rate, burst, max_concurrent, max_queue, queue_timeout, max_keys=10000):
+        self.name = name
+        self.rate = rate
+        self.burst = burst
+        self.max_concurrent = max_concurrent
+        self.max_queue = max_queue
+        self.queue_timeout = queue_timeout
+        self.max_keys = max_keys
+        self._buckets = OrderedDict()
+        self._semaphore = None
+        self.active = 0
+        self.waiting = 0
+        self.stats = {
+            "admitted": 0,
+            "queued": 0,
+            "rate_limited": 0,
+            "shed_queue_full": 0,
+            "shed_timeout": 0,
+            "total_wait_seconds": 0.0,
+            "max_wait_seconds": 0.0,
+        }
+        policies[name] = self
+
+    @classmethod
+    def from_env(cls, name, prefix, rate=2.0, burst=10, max_concurrent=8, max_queue=32, queue_timeout=10.0):
+        """Create a policy whose defaults can be overridden by `<prefix>_*` environment variables."""
+        return cls(
+            name,
+            rate=float(os.getenv(f"{prefix}_RATE_PER_SECOND", rate)),
+            burst=int(os.getenv(f"{prefix}_BURST", burst)),
+            max_concurrent=int(os.getenv(f"{prefix}_MAX_CONCURRENT", max_concurrent)),
+            max_queue=int(os.getenv(f"{prefix}_MAX_QUEUE", max_queue)),
+            queue_timeout=float(os.getenv(f"{prefix}_QUEUE_TIMEOUT", queue_timeout)),
+        )
+
+    def try_charge(self, key):
+        """
+        Take one token from `key`'s bucket, for work not admitted as a request.
+
+        Returns:
+            float: 0 if a token was taken, otherwise seconds until one is available
+        """
+        bucket = self._buckets.pop(key, None) or TokenBucket(self.rate, self.burst)
+        self._buckets[key] = bucket
+        while len(self._buckets) > self.max_keys:
+            self._buckets.popitem(last=False)
+
+        retry_after = bucket.try_acquire()
+        if retry_after > 0:
+            self.stats["rate_limited"] += 1
+        return retry_after
+
+    def _check_rate(self, key):
+        retry_after = self.try_charge(key)
+        if retry_after > 0:
+            raise HTTPException(
+                status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+                detail=f"Rate limit exceeded for {self.name}",
+                headers={"Retry-After": str(math.ceil(retry_after))},
+            )
+
+    def _shed(self, reason):
+        self.stats[reason] += 1
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail=f"Server is busy, {self.name} request was not admitted",
+            headers={"Retry-After": str(math.ceil(self.queue_timeout))},
+        )
+
+    async def _acquire(self):
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self.max_concurrent)
+
+        if self.active >= self.max_concurrent:
+            if self.waiting >= self.max_queue:
+                self._shed("shed_queue_full")
+            self.stats["queued"] += 1
+
+        started = time.monotonic()
+        self.waiting += 1
+        try:
+            await asyncio.wait_for(self._semaphore.acquire(), self.queue_timeout)
+        except asyncio.TimeoutError:
+            self._shed("shed_timeout")
+        finally:
+            self.waiting -= 1
+
+        waited = time.monotonic() - started
+        self.stats["total_wait_seconds"] += waited
+        self.stats["max_wait_seconds"] = max(self.stats["max_wait_seconds"], waited)
+        self.stats["admitted"] += 1
+        self.active += 1
+
+    def _release(self):
+        self.active -= 1
+        self._semaphore.release()
+
+    async def __call__(self, key: str = Depends(verify_token)):
+        """FastAPI dependency: admit the request or raise 429/503."""
+        self._check_rate(key)
+        with stage(f"admission.{self.name}"):
+            await self._acquire()
+        try:
+            yield
+        finally:
+            self._release()
+
+    def snapshot(self):
+        """Current limits, occupancy and counters for this policy."""
+        admitted = self.stats["admitted"]
+        return {
+            "rate_per_second": self.rate,
+            "burst": self.burst,
+            "max_concurrent": self.max_concurrent,
+            "max_queue": self.max_queue,
+            "queue_timeout": self.queue_timeout,
+            "active": self.active,
+            "waiting": self.waiting,
+            "tracked_keys": len(self._buckets),
+            **self.stats,
+            "mean_wait_seconds": self.stats["total_wait_seconds"] / admitted if admitted else 0.0,
+        }
+
+
+def admission_stats():
+    """Statistics for every registered admission policy."""
+    return {name: policy.snapshot() for name, policy in policies.items()}
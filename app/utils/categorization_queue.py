@@ -0,0 +1,226 @@
+"""
+Background categorization of newly created grievances.
+
+Each job runs as a Starlette background task of the request that created the
+grievance, so it starts after the response is sent and still finishes inside
+that request's ASGI call; nothing depends on a process-lifetime worker, which
+serverless deployments do not keep running between requests. A shared
+semaphore bounds how many jobs categorize at once, and results that finish
+close together are written back in one Xata transaction.
+
+Jobs are refused (and the create response says so) when too many are already
+waiting. Refused jobs, and any whose categorization or write failed, leave
+`classified_category` unset; `python -m app.jobs.reclassify --categorize`
+fills those in.
+"""
+import asyncio
+import os
+from datetime import datetime
+from dotenv import load_dotenv
+from .grievance_utils import process_grievance_category, generate_follow_up_questions
+from .read_replica import read_replica
+
+# Load environment variables
+load_dotenv()
+
+# Queue configuration
+CATEGORIZATION_WORKERS = int(os.getenv("CATEGORIZATION_WORKERS", "4"))
+CATEGORIZATION_BATCH_SIZE = int(os.getenv("CATEGORIZATION_BATCH_SIZE", "10"))
+CATEGORIZATION_BATCH_WAIT = float(os.getenv("CATEGORIZATION_BATCH_WAIT", "0.5"))
+CATEGORIZATION_MAX_QUEUE = int(os.getenv("CATEGORIZATION_MAX_QUEUE", "1000"))
+CATEGORIZATION_FOLLOW_UP = os.getenv("CATEGORIZATION_FOLLOW_UP", "false").lower() in ("1", "true", "yes")
+
+# Fields copied from an already-categorized near-duplicate grievance. The
+# follow-up fields are not copied: they hold the open questions of the
+# original's own follow-up conversation, which may belong to another user.
+REUSABLE_FIELDS = [
+    "classified_category",
+    "formatted_fields",
+    "category_data",
+    "is_correct_category",
+]
+
+
+def categorize_grievance_fields(description, follow_up=False, target_collection=None, raise_errors=False):
+    """
+    Categorize a grievance description and build the Grievance fields to store.
+
+    Args:
+        description (str): The grievance description to categorize
+        follow_up (bool): Whether to also generate follow-up questions
+        target_collection: Collection to search instead of the Weaviate category collection
+        raise_errors (bool): Raise search errors instead of treating them as no match
+
+    Returns:
+        dict: Fields to write back to the Grievance record, or None if no
+            category matched
+    """
+    category_info = process_grievance_category(description, target_collection=target_collection,
+                                               raise_errors=raise_errors)
+    top_category = category_info.get('top_category')
+    if top_category is None:
+        return None
+
+    fields = {
+        "classified_category": category_info.get('classified_category', ""),
+        "formatted_fields": category_info.get('formatted_fields', ""),
+        "category_data": top_category,
+    }
+
+    if follow_up:
+        follow_up_info = generate_follow_up_questions(
+            description, top_category, category_info.get('formatted_fields', "")
+        )
+        if follow_up_info is not None:
+            fields["follow_up_questions"] = follow_up_info.follow_up_questions
+            fields["missing_information"] = follow_up_info.missing_information
+            fields["is_correct_category"] = follow_up_info.is_correct_category
+
+    return fields
+
+
+class CategorizationQueue:
+    """
+    Bounded set of background categorization jobs.
+
+    `schedule` adds a job to the request's BackgroundTasks. At most `workers`
+    jobs categorize at once and at most `max_queue` may be scheduled but not
+    finished; beyond that new jobs are refused. The first result of a batch
+    waits up to `batch_wait` seconds for up to `batch_size - 1` others, and
+    the batch is written in one Xata transaction.
+    """
+
+    def __init__(self, xata, table="Grievance", workers=CATEGORIZATION_WORKERS,
+                 batch_size=CATEGORIZATION_BATCH_SIZE, batch_wait=CATEGORIZATION_BATCH_WAIT,
+                 max_queue=CATEGORIZATION_MAX_QUEUE, follow_up=CATEGORIZATION_FOLLOW_UP):
+        self.xata = xata
+        self.table = table
+        self.workers = max(1, workers)
+        self.batch_size = max(1, batch_size)
+        self.batch_wait = batch_wait
+        self.max_queue = max_queue
+        self.follow_up = follow_up
+        self.pending = 0
+        self._semaphore = None
+        self._writes = []
+        self._batch_full = None
+        self.stats = {"scheduled": 0, "refused": 0, "written": 0, "unmatched": 0, "failed": 0}
+
+    def schedule(self, background_tasks, grievance_id, description, duplicate_of=None):
+        """
+        Categorize a grievance after the response has been sent.
+
+        Args:
+            background_tasks (BackgroundTasks): The creating request's background tasks
+            grievance_id (str): ID of the inserted Grievance record
+            description (str): The grievance description to categorize
+            duplicate_of (str, optional): ID of a near-duplicate grievance whose
+                categorization can be copied instead of recomputed
+
+        Returns:
+            bool: True if the job was scheduled, False if too many are pending
+        """
+        if self.pending >= self.max_queue:
+            self.stats["refused"] += 1
+            print(f"Categorization backlog full, leaving grievance {grievance_id} for the backfill job")
+            return False
+        self.pending += 1
+        self.stats["scheduled"] += 1
+        background_tasks.add_task(self._run_job, grievance_id, description, duplicate_of)
+        return True
+
+    def _fields_for(self, description, duplicate_of):
+        if duplicate_of:
+            original = self.xata.records().get(self.table, duplicate_of)
+            if original.is_success() and original.get("classified_category"):
+                return {field: original.get(field) for field in REUSABLE_FIELDS if original.get(field) is not None}
+        return categorize_grievance_fields(description, self.follow_up)
+
+    async def _run_job(self, grievance_id, description, duplicate_of):
+        try:
+            if self._semaphore is None:
+                self._semaphore = asyncio.Semaphore(self.workers)
+            async with self._semaphore:
+                try:
+                    fields = await asyncio.to_thread(self._fields_for, description, duplicate_of)
+                except Exception as e:
+                    print(f"Error categorizing grievance {grievance_id}: {e}")
+                    self.stats["failed"] += 1
+                    return
+            if not fields:
+                self.stats["unmatched"] += 1
+                return
+            if await self._write(grievance_id, fields):
+                self.stats["written"] += 1
+            else:
+                self.stats["failed"] += 1
+        finally:
+            self.pending -= 1
+
+    async def _write(self, grievance_id, fields):
+        """Add a result to the current batch, writing the batch if this job started it."""
+        done = asyncio.get_running_loop().create_future()
+        if not self._writes:
+            self._batch_full = asyncio.Event()
+            leader = True
+        else:
+            leader = False
+        self._writes.append((grievance_id, fields, done))
+        if len(self._writes) >= self.batch_size:
+            self._batch_full.set()
+
+        if leader:
+            try:
+                await asyncio.wait_for(self._batch_full.wait(), self.batch_wait)
+            except asyncio.TimeoutError:
+                pass
+            batch, self._writes = self._writes, []
+            try:
+                written = await asyncio.to_thread(self._write_back, [(gid, f) for gid, f, _ in batch])
+            except Exception as e:
+                print(f"Error storing categorization batch: {e}")
+                written = set()
+            for gid, _, future in batch:
+                future.set_result(gid in written)
+        return await done
+
+    def _write_back(self, updates):
+        """Write a batch of results; returns the IDs of the records that were updated."""
+        current_time = datetime.now().strftime("%Y-%m-%dT%H:%M:%S.%fZ")
+        operations = []
+        for grievance_id, fields in updates:
+            operations.append({
+                "update": {
+                    "table": self.table,
+                    "id": grievance_id,
+                    "fields": {**fields, "updated_at": current_time},
+                }
+            })
+
+        resp = self.xata.records().transaction({"operations": operations})
+        if resp.is_success():
+            for operation in operations:
+                read_replica.update(self.table, operation["update"]["id"], operation["update"]["fields"])
+            return {grievance_id for grievance_id, _ in updates}
+
+        # A transaction fails as a whole, so fall back to per-record updates
+        print(f"Categorization transaction failed, updating records individually: {resp}")
+        written = set()
+        for operation in operations:
+            update = operation["update"]
+            resp = self.xata.records().update(self.table, update["id"], update["fields"])
+            if resp.is_success():
+                read_replica.update(self.table, update["id"], update["fields"])
+                written.add(update["id"])
+            else:
+                print(f"Failed to store categorization for grievance {update['id']}: {resp}")
+        return written
+
+    def snapshot(self):
+        """Pending jobs, limits and outcome counters."""
+        return {
+            "pending": self.pending,
+            "max_queue": self.max_queue,
+            "workers": self.workers,
+            **self.stats,
+        }
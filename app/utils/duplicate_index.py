@@ -0,0 +1,251 @@
+"""
+Near-duplicate detection for grievance text using MinHash and LSH.
+
+Each description is reduced to a MinHash signature whose bands are stored in
+hash buckets, both globally and per user. Looking up a new text only touches
+its own buckets, so the cost does not grow with the number of grievances.
+"""
+import hashlib
+import os
+import re
+import threading
+import time
+from array import array
+from collections import OrderedDict
+from dotenv import load_dotenv
+
+# Load environment variables
+load_dotenv()
+
+DUPLICATE_THRESHOLD = float(os.getenv("DUPLICATE_THRESHOLD", "0.8"))
+DUPLICATE_INDEX_MAX_DOCUMENTS = int(os.getenv("DUPLICATE_INDEX_MAX_DOCUMENTS", "50000"))
+
+# 16 bands of 4 rows: pairs above ~0.5 Jaccard similarity share a bucket with high probability
+NUM_PERMUTATIONS = 64
+BANDS = 16
+ROWS = NUM_PERMUTATIONS // BANDS
+SHINGLE_SIZE = 3
+
+_MERSENNE_PRIME = (1 << 61) - 1
+_MAX_HASH = (1 << 32) - 1
+GLOBAL_SCOPE = "*"
+
+
+def _permutations():
+    # Deterministic coefficients so signatures are stable across processes
+    params = []
+    for i in range(NUM_PERMUTATIONS):
+        digest = hashlib.blake2b(f"minhash-{i}".encode(), digest_size=16).digest()
+        a = int.from_bytes(digest[:8], "little") % _MERSENNE_PRIME or 1
+        b = int.from_bytes(digest[8:], "little") % _MERSENNE_PRIME
+        params.append((a, b))
+    return params
+
+
+_PERMUTATIONS = _permutations()
+
+
+def normalize_text(text):
+    """Lowercase the text and collapse it to alphanumeric words."""
+    return " ".join(re.findall(r"[a-z0-9]+", (text or "").lower()))
+
+
+def shingles(text):
+    """Return the set of word shingles for a piece of text."""
+    words = normalize_text(text).split()
+    if len(words) <= SHINGLE_SIZE:
+        return {" ".join(words)} if words else set()
+    return {" ".join(words[i:i + SHINGLE_SIZE]) for i in range(len(words) - SHINGLE_SIZE + 1)}
+
+
+def minhash_signature(text):
+    """
+    Compute the MinHash signature of a text.
+
+    Args:
+        text (str): The text to sign
+
+    Returns:
+        array: NUM_PERMUTATIONS unsigned 32-bit minimum hashes, or None for empty text
+    """
+    tokens = shingles(text)
+    if not tokens:
+        return None
+
+    hashes = [int.from_bytes(hashlib.blake2b(t.encode(), digest_size=8).digest(), "little") for t in tokens]
+    signature = array("L")
+    for a, b in _PERMUTATIONS:
+        signature.append(min(((a * h + b) % _MERSENNE_PRIME) & _MAX_HASH for h in hashes))
+    return signature
+
+
+def estimate_similarity(sig_a, sig_b):
+    """Estimate the Jaccard similarity of two texts from their signatures."""
+    return sum(1 for x, y in zip(sig_a, sig_b) if x == y) / NUM_PERMUTATIONS
+
+
+def _band_keys(signature):
+    return [hash(tuple(signature[i * ROWS:(i + 1) * ROWS])) for i in range(BANDS)]
+
+
+class DuplicateIndex:
+    """
+    Incremental LSH index of texts, scoped globally and per user.
+
+    Documents are evicted oldest-first once `max_documents` is reached, or
+    once they are older than `ttl` seconds if a TTL is set. An optional
+    payload can be stored with each document so callers can reuse work done
+    for the original (for example a categorization result).
+    """
+
+    def __init__(self, threshold=DUPLICATE_THRESHOLD, max_documents=DUPLICATE_INDEX_MAX_DOCUMENTS, ttl=None):
+        self.threshold = threshold
+        self.max_documents = max_documents
+        self.ttl = ttl
+        self._documents = OrderedDict()  # doc_id -> (user_id, signature, payload, added_at)
+        self._buckets = {}  # (scope, band, key) -> set of doc_ids
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._documents)
+
+    def _scopes(self, user_id):
+        return (GLOBAL_SCOPE, user_id) if user_id else (GLOBAL_SCOPE,)
+
+    def add(self, doc_id, text, user_id=None, payload=None, signature=None):
+        """
+        Add a document to the index, replacing any previous entry with the same ID.
+
+        Args:
+            doc_id (str): Identifier returned by later lookups (e.g. a grievance ID)
+            text (str): The text to index
+            user_id (str, optional): Owner of the document for per-user lookups
+            payload (any, optional): Data to return alongside a match
+            signature (array, optional): minhash_signature(text), if already computed
+
+        Returns:
+            bool: True if the document was indexed, False if the text was empty
+        """
+        if signature is None:
+            signature = minhash_signature(text)
+        if signature is None:
+            return False
+
+        with self._lock:
+            if doc_id in self._documents:
+                self._remove(doc_id)
+            self._documents[doc_id] = (user_id, signature, payload, time.monotonic())
+            for band, key in enumerate(_band_keys(signature)):
+                for scope in self._scopes(user_id):
+                    self._buckets.setdefault((scope, band, key), set()).add(doc_id)
+            self._expire()
+            while len(self._documents) > self.max_documents:
+                self._remove(next(iter(self._documents)))
+        return True
+
+    def _expire(self):
+        # Documents are kept in insertion order, so the expired ones are at the front
+        if self.ttl is None:
+            return
+        cutoff = time.monotonic() - self.ttl
+        while self._documents:
+            doc_id, document = next(iter(self._documents.items()))
+            if document[3] > cutoff:
+                break
+            self._remove(doc_id)
+
+    def _remove(self, doc_id):
+        user_id, signature, _, _ = self._documents.pop(doc_id)
+        for band, key in enumerate(_band_keys(signature)):
+            for scope in self._scopes(user_id):
+                bucket = self._buckets.get((scope, band, key))
+                if bucket is not None:
+                    bucket.discard(doc_id)
+                    if not bucket:
+                        del self._buckets[(scope, band, key)]
+
+    def remove(self, doc_id):
+        """Remove a document from the index if present."""
+        with self._lock:
+            if doc_id in self._documents:
+                self._remove(doc_id)
+
+    def find_duplicate(self, text, user_id=None, signature=None):
+        """
+        Find the most similar indexed document above the similarity threshold.
+
+        Matches from the same user are preferred over global matches.
+
+        Args:
+            text (str): The text to look up
+            user_id (str, optional): Look in this user's documents first
+            signature (array, optional): minhash_signature(text), if already computed
+
+        Returns:
+            dict: {'id', 'similarity', 'scope', 'payload'} for the best match,
+                or None if there is no likely duplicate
+        """
+        if signature is None:
+            signature = minhash_signature(text)
+        if signature is None:
+            return None
+
+        keys = _band_keys(signature)
+        with self._lock:
+            self._expire()
+            for scope in reversed(self._scopes(user_id)):
+                candidates = set()
+                for band, key in enumerate(keys):
+                    candidates |= self._buckets.get((scope, band, key), set())
+
+                best_id, best_similarity = None, 0.0
+                for doc_id in candidates:
+                    similarity = estimate_similarity(signature, self._documents[doc_id][1])
+                    if similarity > best_similarity:
+                        best_id, best_similarity = doc_id, similarity
+
+                if best_id is not None and best_similarity >= self.threshold:
+                    return {
+                        "id": best_id,
+                        "similarity": best_similarity,
+                        "scope": "user" if scope != GLOBAL_SCOPE else "global",
+                        "payload": self._documents[best_id][2],
+                    }
+        return None
+
+    def load_from_xata(self, xata, table="Grievance", page_size=200):
+        """
+        Build the index from a full scan of a Xata table.
+
+        Args:
+            xata: XataClient instance
+            table (str): Table to scan
+            page_size (int): Records fetched per request
+
+        Returns:
+            int: Number of documents indexed
+        """
+        indexed = 0
+        cursor = None
+        while True:
+            query = {"columns": ["id", "user_id", "description"], "page": {"size": page_size}}
+            if cursor:
+                query["page"]["after"] = cursor
+            resp = xata.data().query(table, query)
+            if not resp.is_success():
+                print(f"Failed to scan {table} for duplicate index: {resp}")
+                break
+
+            for record in resp.get("records", []):
+                user_id = record.get("user_id")
+                if isinstance(user_id, dict):
+                    user_id = user_id.get("id")
+                if self.add(record["id"], record.get("description", ""), user_id):
+                    indexed += 1
+
+            cursor = resp.get_cursor()
+            if not resp.has_more_results() or not cursor:
+                break
+
+        print(f"Duplicate index loaded {indexed} documents from {table}")
+        return indexed
@@ -0,0 +1,187 @@
+"""
+Incremental follow-up question sessions for grievances.
+
+A session keeps each follow-up question with its answered state and answer.
+Every turn verifies only the questions that are still open against the newest
+answer. After each turn the whole session (questions, answered flags, answers
+and turn count) is written to the Grievance record's `follow_up_session` JSON
+column (added by migration mig_d3pk2hq7a1lcv5r0fug0), so it resumes exactly,
+including as complete, after a restart. The
+open questions are also kept in `follow_up_questions` / `missing_information`
+for existing readers of those fields.
+"""
+import asyncio
+import json
+import os
+from collections import OrderedDict
+from datetime import datetime
+from dotenv import load_dotenv
+from ..models.grievance_models import FollowUpSession, FollowUpQuestionState
+from .grievance_utils import process_grievance_category, generate_follow_up_questions, verify_open_questions
+from .read_replica import read_replica
+
+# Load environment variables
+load_dotenv()
+
+FOLLOW_UP_MAX_SESSIONS = int(os.getenv("FOLLOW_UP_MAX_SESSIONS", "10000"))
+
+
+class FollowUpSessionStore:
+    """
+    Bounded in-memory store of follow-up sessions backed by the Grievance table.
+
+    The methods are synchronous (they call Xata and the LLM) and are meant to
+    be run in a worker thread while holding `lock(grievance_id)`.
+    """
+
+    def __init__(self, xata, table="Grievance", max_sessions=FOLLOW_UP_MAX_SESSIONS):
+        self.xata = xata
+        self.table = table
+        self.max_sessions = max_sessions
+        self._sessions = OrderedDict()
+        self._locks = {}
+
+    def lock(self, grievance_id):
+        """Lock serializing turns of one grievance's session."""
+        if grievance_id not in self._locks:
+            self._locks[grievance_id] = asyncio.Lock()
+        return self._locks[grievance_id]
+
+    def _remember(self, session):
+        self._sessions.pop(session.grievance_id, None)
+        self._sessions[session.grievance_id] = session
+        while len(self._sessions) > self.max_sessions:
+            evicted, _ = self._sessions.popitem(last=False)
+            lock = self._locks.get(evicted)
+            if lock is not None and not lock.locked():
+                del self._locks[evicted]
+
+    def discard_lock(self, grievance_id):
+        """Drop the lock of a grievance that has no session, e.g. after a lookup failed."""
+        lock = self._locks.get(grievance_id)
+        if lock is not None and not lock.locked() and grievance_id not in self._sessions:
+            del self._locks[grievance_id]
+
+    def _get_record(self, grievance_id):
+        record = self.xata.records().get(self.table, grievance_id)
+        if not record.is_success():
+            raise LookupError("Grievance not found")
+        return record
+
+    def get(self, grievance_id):
+        """
+        Return the session for a grievance, resuming it from the record if needed.
+
+        Returns:
+            FollowUpSession: The session, or None if no follow-up has started
+        """
+        session = self._sessions.get(grievance_id)
+        if session is not None:
+            return session
+
+        record = self._get_record(grievance_id)
+        stored = record.get("follow_up_session")
+        if isinstance(stored, str):
+            stored = json.loads(stored)
+        if stored:
+            session = FollowUpSession.model_validate({**stored, "grievance_id": grievance_id})
+        elif record.get("follow_up_questions"):
+            # Records written before sessions were stored only list the open questions
+            session = FollowUpSession(
+                grievance_id=grievance_id,
+                questions=[FollowUpQuestionState(question=q) for q in record["follow_up_questions"]],
+            )
+        else:
+            return None
+        self._remember(session)
+        return session
+
+    def start(self, grievance_id, restart=False):
+        """
+        Start (or resume) a session, generating questions if the record has none.
+
+        Args:
+            grievance_id (str): The grievance to ask follow-up questions about
+            restart (bool): Discard any existing session and generate new questions
+
+        Returns:
+            FollowUpSession: The session
+        """
+        if not restart:
+            session = self.get(grievance_id)
+            if session is not None:
+                return session
+
+        record = self._get_record(grievance_id)
+        description = record.get("description", "")
+        category = record.get("category_data")
+        formatted_fields = record.get("formatted_fields") or ""
+        if not category:
+            category_info = process_grievance_category(description)
+            category = category_info.get('top_category')
+            formatted_fields = category_info.get('formatted_fields', "")
+
+        # A failed generation must not be stored as an empty, complete session
+        follow_up = generate_follow_up_questions(description, category, formatted_fields)
+        if follow_up is None:
+            raise RuntimeError("Failed to generate follow-up questions")
+
+        session = FollowUpSession(
+            grievance_id=grievance_id,
+            questions=[FollowUpQuestionState(question=q) for q in follow_up.follow_up_questions],
+        )
+        self._persist(session)
+        self._remember(session)
+        return session
+
+    def answer(self, grievance_id, answer_text):
+        """
+        Record a new answer and mark the open questions it resolves.
+
+        Args:
+            grievance_id (str): The grievance whose session is being answered
+            answer_text (str): The user's new answer text
+
+        Returns:
+            tuple: (FollowUpSession, list of question texts answered this turn)
+        """
+        session = self.get(grievance_id)
+        if session is None:
+            raise LookupError("No follow-up session for this grievance")
+
+        # Work on a copy so a failed write leaves the remembered session unchanged
+        session = session.model_copy(deep=True)
+        open_questions = session.open_questions
+        if not open_questions:
+            return session, []
+
+        verification = verify_open_questions([q.question for q in open_questions], answer_text)
+        if verification is None:
+            raise RuntimeError("Failed to verify follow-up answer")
+
+        newly_answered = []
+        for number in verification.answered_question_numbers:
+            if 1 <= number <= len(open_questions) and not open_questions[number - 1].answered:
+                state = open_questions[number - 1]
+                state.answered = True
+                state.answer = answer_text
+                newly_answered.append(state.question)
+
+        session.turns += 1
+        self._persist(session)
+        self._remember(session)
+        return session, newly_answered
+
+    def _persist(self, session):
+        open_questions = [q.question for q in session.open_questions]
+        fields = {
+            "follow_up_session": session.model_dump(exclude={"grievance_id"}),
+            "follow_up_questions": open_questions,
+            "missing_information": bool(open_questions),
+            "updated_at": datetime.now().strftime("%Y-%m-%dT%H:%M:%S.%fZ"),
+        }
+        resp = self.xata.records().update(self.table, session.grievance_id, fields)
+        if not resp.is_success():
+            print(f"Failed to store follow-up state for grievance {session.grievance_id}: {resp}")
+            raise RuntimeError("Failed to store follow-up session")
+        read_replica.update(self.table, session.grievance_id, fields)
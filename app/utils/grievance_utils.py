@@ -5,9 +5,19 @@ import json
 import atexit
 from weaviate.classes.query import Rerank
 from dotenv import load_dotenv
-from openai import OpenAI
-import instructor
-from ..models.grievance_models import FollowUpQuestions, AnswerVerification
+from .profiling import stage
+from .query_embeddings import get_query_vector
+from ..models.grievance_models import FollowUpQuestions, AnswerVerification, OpenQuestionVerification
+from .llm import (
+    LLM_PROMPT_TOKEN_BUDGET,
+    category_confidence,
+    choose_model,
+    compact_category,
+    compact_fields,
+    count_tokens,
+    structured_completion,
+    truncate_to_budget,
+)
 
 # Load environment variables
 load_dotenv()
@@ -83,12 +93,22 @@ except Exception as e:
     print(f"Initial client connection failed: {e}")
 
 
-def fetch_category(grievance):
+def fetch_category(grievance, alpha=1.0, limit=10, rerank=True,
+                   rerank_prop="description_of_Grievance_Category", target_collection=None,
+                   raise_errors=False):
     """
     Fetch the correct category of grievance using vector search.
     
     Args:
         grievance (str): The grievance description to categorize
+        alpha (float): Hybrid search balance, 1.0 is pure vector and 0.0 pure keyword
+        limit (int): Maximum number of categories to return
+        rerank (bool): Whether to rerank the results
+        rerank_prop (str): Category property the reranker compares against
+        target_collection: Collection to query instead of the Weaviate category
+            collection (e.g. a local copy for offline evaluation)
+        raise_errors (bool): Re-raise search errors instead of returning an
+            empty list, so callers can tell an outage from no match
         
     Returns:
         list: List of structured category data with scores and properties
@@ -96,18 +116,27 @@ def fetch_category(grievance):
     try:
         # Ensure client is initialized
         global client, collection
-        if client is None or collection is None:
-            client, collection = initialize_client()
+        search_options = {}
+        if target_collection is None:
+            if client is None or collection is None:
+                client, collection = initialize_client()
+            target_collection = collection
+            # Reuse a cached query vector instead of having Weaviate embed the text again
+            query_vector = get_query_vector(grievance) if alpha > 0 else None
+            if query_vector is not None:
+                search_options["vector"] = query_vector
             
-        response = collection.query.hybrid(
-            query=grievance,
-            alpha=1.0,
-            limit=10,
-            rerank=Rerank(
-                prop="description_of_Grievance_Category",
-                query=grievance
+        with stage("weaviate.category"):
+            response = target_collection.query.hybrid(
+                query=grievance,
+                alpha=alpha,
+                limit=limit,
+                rerank=Rerank(
+                    prop=rerank_prop,
+                    query=grievance
+                ) if rerank else None,
+                **search_options
             )
-        )
         
         categories = response.objects
         bucket_data = []
@@ -145,15 +174,39 @@ def fetch_category(grievance):
         return bucket_data
     except Exception as e:
         print(f"Error fetching categories: {e}")
+        if raise_errors:
+            raise
+        return []
+
+
+def parse_form_fields(form_fields_str):
+    """
+    Parse a category's `gpt_form_field_generation` JSON into a list of field dicts.
+    
+    Args:
+        form_fields_str (str): JSON array (or comma-separated JSON objects) of fields
+        
+    Returns:
+        list: Field dicts, or an empty list if the JSON cannot be parsed
+    """
+    try:
+        # Handle the case where the string might not be a complete JSON array
+        if form_fields_str and not form_fields_str.startswith('['):
+            form_fields_str = '[' + form_fields_str + ']'
+        return json.loads(form_fields_str or '[]')
+    except json.JSONDecodeError as e:
+        print(f"Error parsing form fields JSON: {e}")
         return []
 
 
-def process_grievance_category(grievance_text):
+def process_grievance_category(grievance_text, target_collection=None, raise_errors=False):
     """
     Process a grievance description to extract category information and form fields.
     
     Args:
         grievance_text (str): The grievance description to categorize
+        target_collection: Collection to query instead of the Weaviate category collection
+        raise_errors (bool): Re-raise search errors instead of returning no categories
         
     Returns:
         dict: A dictionary containing category information and formatted fields
@@ -166,7 +219,7 @@ def process_grievance_category(grievance_text):
     """
     try:
         # Fetch potential categories
-        categories = fetch_category(grievance_text)
+        categories = fetch_category(grievance_text, target_collection=target_collection, raise_errors=raise_errors)
         
         if not categories or len(categories) == 0:
             print("No matching categories found")
@@ -180,15 +233,7 @@ def process_grievance_category(grievance_text):
         top_category = categories[0]
         
         # Extract form fields from the top category
-        try:
-            form_fields_str = top_category.get('gpt_form_field_generation', '[]')
-            # Handle the case where the string might not be a complete JSON array
-            if form_fields_str and not form_fields_str.startswith('['):
-                form_fields_str = '[' + form_fields_str + ']'
-            form_fields = json.loads(form_fields_str)
-        except json.JSONDecodeError as e:
-            print(f"Error parsing form fields JSON: {e}")
-            form_fields = []
+        form_fields = parse_form_fields(top_category.get('gpt_form_field_generation', '[]'))
         
         # Create a formatted string representation of the form fields
         formatted_fields = ""
@@ -212,6 +257,8 @@ def process_grievance_category(grievance_text):
         }
     except Exception as e:
         print(f"Error processing grievance category: {e}")
+        if raise_errors:
+            raise
         return {
             'categories': [],
             'top_category': None,
@@ -223,6 +270,10 @@ def process_grievance_category(grievance_text):
 def generate_follow_up_questions(grievance, category, required_fields):
     """Generate follow-up questions for a grievance based on missing information.
     
+    The prompt uses a compact category and one-line-per-field representation
+    and is kept within LLM_PROMPT_TOKEN_BUDGET. Confident, short cases go to
+    the fast model; low-confidence categories or long grievances escalate.
+    
     Args:
         grievance (str): The grievance description
         category (dict): The category information
@@ -231,9 +282,13 @@ def generate_follow_up_questions(grievance, category, required_fields):
     Returns:
         FollowUpQuestions: Object containing follow-up questions and categorization info
     """
-    ins_client = instructor.from_openai(OpenAI())
+    model = choose_model(count_tokens(grievance), category_confidence(category))
+
+    category_text = compact_category(category)
+    form_fields = parse_form_fields(category.get('gpt_form_field_generation')) if isinstance(category, dict) else []
+    fields_text = compact_fields(form_fields) if form_fields else required_fields
 
-    prompt = f"""
+    template = """
     You are an AI assistant helping with grievance categorization analysis. 
     
     USER GRIEVANCE:
@@ -242,26 +297,29 @@ def generate_follow_up_questions(grievance, category, required_fields):
     ASSIGNED CATEGORY:
     {category}
     
-    REQUIRED FORM FIELDS:
-    {required_fields}
+    REQUIRED FORM FIELDS (name (type, required) [options]: description):
+    {fields}
     
     Please analyze:
     1. Is this grievance correctly categorized? Why or why not?
     2. Based on the user grievance, what information is missing that would be required by the form fields?
     3. What follow-up questions should be asked to gather the missing information?
-    """ 
+    """
+
+    # Give the grievance up to half the budget and the form fields whatever is left
+    budget = LLM_PROMPT_TOKEN_BUDGET - count_tokens(template, model) - count_tokens(category_text, model)
+    grievance_text = truncate_to_budget(grievance, budget // 2, model)
+    fields_text = truncate_to_budget(fields_text, budget - count_tokens(grievance_text, model), model)
+    prompt = template.format(grievance=grievance_text, category=category_text, fields=fields_text)
 
     try:
-        response = ins_client.chat.completions.create(
-            model="gpt-4.1-mini",
-            response_model=FollowUpQuestions,
-            messages=[
-                {"role": "system", "content": "You are an AI assistant that analyzes grievance categorizations and identifies missing information."},
-                {"role": "user", "content": prompt}
-            ],
+        return structured_completion(
+            "generate_follow_up_questions",
+            model,
+            FollowUpQuestions,
+            "You are an AI assistant that analyzes grievance categorizations and identifies missing information.",
+            prompt,
         )
-        
-        return response
     except Exception as e:
         print(f"Error generating follow-up questions: {e}")
         return None
@@ -279,16 +337,17 @@ def verify_follow_up_answers(original_grievance, follow_up_questions, additional
     Returns:
         AnswerVerification: Object containing verification results
     """
-    ins_client = instructor.from_openai(OpenAI())
-    
-    prompt = f"""
+    model = choose_model(count_tokens(additional_information))
+    questions_text = "\n".join([f"{i+1}. {q}" for i, q in enumerate(follow_up_questions)])
+
+    template = """
     You are an AI assistant helping to verify if a user's additional information answers all the follow-up questions for a grievance.
     
     ORIGINAL GRIEVANCE:
-    {original_grievance}
+    {grievance}
     
     FOLLOW-UP QUESTIONS THAT WERE ASKED:
-    {"\n".join([f"{i+1}. {q}" for i, q in enumerate(follow_up_questions)])}
+    {questions}
     
     ADDITIONAL INFORMATION PROVIDED BY USER:
     {additional_information}
@@ -305,23 +364,73 @@ def verify_follow_up_answers(original_grievance, follow_up_questions, additional
     
     Be specific and detailed in your analysis, focusing solely on the questions that were originally asked.
     """
+
+    # Give the original grievance up to a third of the budget and the answer the rest
+    budget = LLM_PROMPT_TOKEN_BUDGET - count_tokens(template, model) - count_tokens(questions_text, model)
+    original_grievance = truncate_to_budget(original_grievance, budget // 3, model)
+    additional_information = truncate_to_budget(
+        additional_information, budget - count_tokens(original_grievance, model), model
+    )
+    prompt = template.format(
+        grievance=original_grievance, questions=questions_text, additional_information=additional_information
+    )
     
     try:
-        response = ins_client.chat.completions.create(
-            model="gpt-4.1-mini",
-            response_model=AnswerVerification,
-            messages=[
-                {"role": "system", "content": "You are an AI assistant that verifies if follow-up questions for grievances have been answered."},
-                {"role": "user", "content": prompt}
-            ],
+        return structured_completion(
+            "verify_follow_up_answers",
+            model,
+            AnswerVerification,
+            "You are an AI assistant that verifies if follow-up questions for grievances have been answered.",
+            prompt,
         )
-        
-        return response
     except Exception as e:
         print(f"Error verifying follow-up answers: {e}")
         return None
 
 
+def verify_open_questions(open_questions, new_answer):
+    """Check which still-open follow-up questions a new answer resolves.
+
+    Only the open questions and the latest answer text are sent, so the prompt
+    stays the same size however many turns the conversation has had.
+
+    Args:
+        open_questions (list): Follow-up questions that are not answered yet
+        new_answer (str): The answer text the user just provided
+
+    Returns:
+        OpenQuestionVerification: Numbers (1-based) of the questions answered
+    """
+    model = choose_model(count_tokens(new_answer))
+    questions_text = "\n".join([f"{i+1}. {q}" for i, q in enumerate(open_questions)])
+
+    template = """
+    OPEN FOLLOW-UP QUESTIONS:
+    {questions}
+
+    NEW ANSWER FROM USER:
+    {answer}
+
+    Return the numbers of the questions above that the new answer fully answers.
+    Do not include questions that are only partially answered or not addressed.
+    """
+
+    budget = LLM_PROMPT_TOKEN_BUDGET - count_tokens(template, model) - count_tokens(questions_text, model)
+    prompt = template.format(questions=questions_text, answer=truncate_to_budget(new_answer, budget, model))
+
+    try:
+        return structured_completion(
+            "verify_open_questions",
+            model,
+            OpenQuestionVerification,
+            "You are an AI assistant that checks which grievance follow-up questions a user's answer resolves.",
+            prompt,
+        )
+    except Exception as e:
+        print(f"Error verifying open follow-up questions: {e}")
+        return None
+
+
 def fetch_faqs(query, limit=5):
     """
     Fetch FAQ information based on a query using vector search.
@@ -346,15 +455,20 @@ def fetch_faqs(query, limit=5):
         # Get the FAQ collection
         faq_collection = client.collections.get(faq_collection_name)
 
-        response = faq_collection.query.hybrid(
-            query=query,
-            alpha=0.5,  # Balance between vector and keyword search
-            limit=limit,
-            rerank=Rerank(
-                prop="question",  # Rerank based on the question field
-                query=query
+        # Same cached vector as the category search for the same text
+        query_vector = get_query_vector(query)
+
+        with stage("weaviate.faq"):
+            response = faq_collection.query.hybrid(
+                query=query,
+                alpha=0.5,  # Balance between vector and keyword search
+                vector=query_vector,
+                limit=limit,
+                rerank=Rerank(
+                    prop="question",  # Rerank based on the question field
+                    query=query
+                )
             )
-        )
 
         faqs = response.objects
         faq_data = []
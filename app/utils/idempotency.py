@@ -0,0 +1,103 @@
+"""
+Idempotency-Key support for create endpoints.
+
+The first request with a given key runs normally and its response is kept
+for IDEMPOTENCY_TTL_SECONDS. Retries with the same key and the same request
+body get the stored response without touching Xata; retries that arrive
+while the first attempt is still running wait for it instead of creating a
+duplicate. Failed attempts are not stored, so they can be retried.
+"""
+import asyncio
+import hashlib
+import json
+import os
+import time
+from collections import OrderedDict
+from fastapi import HTTPException, status
+from dotenv import load_dotenv
+
+# Load environment variables
+load_dotenv()
+
+IDEMPOTENCY_TTL_SECONDS = float(os.getenv("IDEMPOTENCY_TTL_SECONDS", "86400"))
+IDEMPOTENCY_MAX_ENTRIES = int(os.getenv("IDEMPOTENCY_MAX_ENTRIES", "10000"))
+IDEMPOTENCY_KEY_MAX_LENGTH = 255
+
+
+def request_fingerprint(route, body):
+    """Stable hash of a route and its request body."""
+    payload = json.dumps({"route": route, "body": body}, sort_keys=True, default=str)
+    return hashlib.sha256(payload.encode()).hexdigest()
+
+
+class IdempotencyStore:
+    """
+    Bounded TTL store of in-progress and completed responses by idempotency key.
+
+    Entries are kept in insertion order, which is also expiry order because
+    every entry has the same TTL.
+    """
+
+    def __init__(self, ttl=IDEMPOTENCY_TTL_SECONDS, max_entries=IDEMPOTENCY_MAX_ENTRIES):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._entries = OrderedDict()  # (scope, key) -> (expires_at, fingerprint, future)
+
+    def _evict(self):
+        now = time.monotonic()
+        while self._entries:
+            expires_at = next(iter(self._entries.values()))[0]
+            if expires_at > now and len(self._entries) <= self.max_entries:
+                break
+            self._entries.popitem(last=False)
+
+    async def run(self, scope, key, fingerprint, handler):
+        """
+        Run `handler` once per (scope, key) and return its stored result on retries.
+
+        Args:
+            scope (tuple): Namespace for the key, e.g. (API key, route)
+            key (str): The client's Idempotency-Key header value
+            fingerprint (str): Hash of the request; reusing a key for a
+                different request is rejected with 422
+            handler: Coroutine function producing the response data
+
+        Returns:
+            tuple: (response data, True if it was replayed from the store)
+        """
+        if len(key) > IDEMPOTENCY_KEY_MAX_LENGTH:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail=f"Idempotency-Key must be at most {IDEMPOTENCY_KEY_MAX_LENGTH} characters"
+            )
+
+        self._evict()
+        entry = self._entries.get((scope, key))
+        if entry is not None:
+            _, stored_fingerprint, future = entry
+            if stored_fingerprint != fingerprint:
+                raise HTTPException(
+                    status_code=422,
+                    detail="Idempotency-Key was already used for a different request"
+                )
+            # Waits if the first attempt is still running
+            return await asyncio.shield(future), True
+
+        future = asyncio.get_running_loop().create_future()
+        self._entries[(scope, key)] = (time.monotonic() + self.ttl, fingerprint, future)
+        try:
+            result = await handler()
+        except BaseException as e:
+            # Forget failed attempts so the client can retry, and pass the error to any waiters
+            self._entries.pop((scope, key), None)
+            if isinstance(e, asyncio.CancelledError):
+                future.cancel()
+            else:
+                future.set_exception(e)
+                future.exception()
+            raise
+        future.set_result(result)
+        return result, False
+
+
+idempotency_store = IdempotencyStore()
@@ -0,0 +1,266 @@
+"""
+Speculative category and FAQ suggestions for grievance text that is still
+being typed.
+
+An IntakeSession receives the current text on every change. Lookups start
+only after the text has been still for INTAKE_DEBOUNCE_SECONDS; newer text
+cancels a pending or running lookup so its results are never pushed. Each
+session runs at most one upstream query at a time, no more often than
+INTAKE_MIN_QUERY_INTERVAL and at most INTAKE_MAX_QUERIES_PER_SESSION times. Every upstream query is also charged to
+the API key's admission token bucket, and one key may hold at most
+INTAKE_MAX_SESSIONS_PER_KEY sessions. Results are cached by normalized text across sessions, and suggestions are
+pushed only when the ranking changes.
+"""
+import asyncio
+import os
+import time
+from collections import OrderedDict
+from dotenv import load_dotenv
+from .duplicate_index import normalize_text
+from .grievance_utils import fetch_category, fetch_faqs, parse_form_fields
+
+# Load environment variables
+load_dotenv()
+
+INTAKE_DEBOUNCE_SECONDS = float(os.getenv("INTAKE_DEBOUNCE_SECONDS", "0.4"))
+INTAKE_MIN_QUERY_INTERVAL = float(os.getenv("INTAKE_MIN_QUERY_INTERVAL", "1.0"))
+INTAKE_MAX_QUERIES_PER_SESSION = int(os.getenv("INTAKE_MAX_QUERIES_PER_SESSION", "60"))
+INTAKE_MAX_SESSIONS = int(os.getenv("INTAKE_MAX_SESSIONS", "200"))
+INTAKE_MAX_SESSIONS_PER_KEY = int(os.getenv("INTAKE_MAX_SESSIONS_PER_KEY", "3"))
+# Texts shorter than this (after normalization) are not looked up
+INTAKE_MIN_CHARS = int(os.getenv("INTAKE_MIN_CHARS", "15"))
+INTAKE_MAX_TEXT_CHARS = int(os.getenv("INTAKE_MAX_TEXT_CHARS", "5000"))
+INTAKE_CACHE_SIZE = int(os.getenv("INTAKE_CACHE_SIZE", "2000"))
+INTAKE_CATEGORY_LIMIT = int(os.getenv("INTAKE_CATEGORY_LIMIT", "5"))
+INTAKE_TOP_K = int(os.getenv("INTAKE_TOP_K", "3"))
+INTAKE_FAQ_LIMIT = int(os.getenv("INTAKE_FAQ_LIMIT", "3"))
+
+SUGGESTION_FIELDS = ["id", "concat_grievance_category", "department_name", "score", "rerank_score"]
+
+
+def category_suggestions(text):
+    """
+    Top categories and the top category's form fields for a text.
+
+    Returns:
+        dict: Suggestion payload, or None if no categories were found
+    """
+    categories = fetch_category(text, limit=INTAKE_CATEGORY_LIMIT)
+    if not categories:
+        return None
+    top_category = categories[0]
+    return {
+        "top_categories": [{field: c.get(field) for field in SUGGESTION_FIELDS} for c in categories[:INTAKE_TOP_K]],
+        "classified_category": top_category.get("concat_grievance_category") or "",
+        "form_fields": parse_form_fields(top_category.get("gpt_form_field_generation") or "[]"),
+    }
+
+
+def faq_suggestions(text):
+    """
+    Matching FAQs for a text.
+
+    Returns:
+        dict: Suggestion payload, or None if no FAQs were found
+    """
+    faqs = fetch_faqs(text, INTAKE_FAQ_LIMIT)
+    return {"faqs": faqs} if faqs else None
+
+
+# Suggestion kinds: how to look them up and which ids define their ranking
+SUGGESTIONS = {
+    "categories": (category_suggestions, lambda payload: [c["id"] or c["concat_grievance_category"] for c in payload["top_categories"]]),
+    "faqs": (faq_suggestions, lambda payload: [f["id"] for f in payload["faqs"]]),
+}
+
+
+class SuggestionCache:
+    """Bounded LRU cache of suggestion payloads by (kind, normalized text)."""
+
+    def __init__(self, max_entries=INTAKE_CACHE_SIZE):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+
+    def get(self, kind, key):
+        payload = self._entries.get((kind, key))
+        if payload is not None:
+            self._entries.move_to_end((kind, key))
+        return payload
+
+    def put(self, kind, key, payload):
+        self._entries[(kind, key)] = payload
+        self._entries.move_to_end((kind, key))
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def longest_prefix(self, kind, key):
+        """Payload for the longest cached word prefix of `key`, or None."""
+        end = len(key)
+        while end > 0:
+            payload = self._entries.get((kind, key[:end]))
+            if payload is not None:
+                return payload
+            end = key.rfind(" ", 0, end)
+        return None
+
+    def __len__(self):
+        return len(self._entries)
+
+
+suggestion_cache = SuggestionCache()
+
+# Totals across sessions, for the admin statistics endpoint
+active_sessions = 0
+# Open sessions by API key
+sessions_by_key = {}
+intake_totals = {
+    "sessions": 0,
+    "updates": 0,
+    "superseded": 0,
+    "cache_hits": 0,
+    "prefix_hits": 0,
+    "queries": 0,
+    "budget_exhausted": 0,
+    "rate_limited": 0,
+    "pushes": 0,
+}
+
+
+class IntakeSession:
+    """
+    Suggestion state for one client typing a grievance.
+
+    Args:
+        send: Coroutine function sending a JSON-serializable message to the client
+        cache (SuggestionCache, optional): Cache shared between sessions
+        key (str, optional): API key the session belongs to
+        admission (dict, optional): AdmissionPolicy by suggestion kind, charged
+            for every upstream query made with `key`
+    """
+
+    def __init__(self, send, cache=None, debounce=INTAKE_DEBOUNCE_SECONDS,
+                 min_interval=INTAKE_MIN_QUERY_INTERVAL, max_queries=INTAKE_MAX_QUERIES_PER_SESSION,
+                 key=None, admission=None):
+        self.send = send
+        self.key = key
+        self.admission = admission or {}
+        self.cache = cache if cache is not None else suggestion_cache
+        self.debounce = debounce
+        self.min_interval = min_interval
+        self.max_queries = max_queries
+        self.text = ""
+        self.queries = 0
+        self._pending = None
+        self._upstream = None
+        self._last_query_at = float("-inf")
+        self._rankings = {}
+        self._closed = False
+        global active_sessions
+        active_sessions += 1
+        sessions_by_key[key] = sessions_by_key.get(key, 0) + 1
+        intake_totals["sessions"] += 1
+
+    def update(self, text):
+        """Replace the current text and schedule a lookup, superseding any earlier one."""
+        self.text = (text or "")[:INTAKE_MAX_TEXT_CHARS]
+        intake_totals["updates"] += 1
+        if self._pending is not None and not self._pending.done():
+            self._pending.cancel()
+            intake_totals["superseded"] += 1
+        self._pending = asyncio.create_task(self._suggest(self.text))
+
+    async def close(self):
+        """Cancel the pending lookup; a running upstream call finishes in its thread."""
+        global active_sessions
+        if not self._closed:
+            self._closed = True
+            active_sessions -= 1
+            sessions_by_key[self.key] -= 1
+            if not sessions_by_key[self.key]:
+                del sessions_by_key[self.key]
+        if self._pending is not None and not self._pending.done():
+            self._pending.cancel()
+            try:
+                await self._pending
+            except asyncio.CancelledError:
+                pass
+
+    async def _suggest(self, text):
+        await asyncio.sleep(self.debounce)
+        key = normalize_text(text)
+        if len(key) < INTAKE_MIN_CHARS:
+            return
+        # Categories first: if the text changes meanwhile, the FAQ lookup never starts
+        for kind in SUGGESTIONS:
+            payload = await self._lookup(kind, key, text)
+            if payload is not None:
+                await self._push(kind, payload, text)
+
+    async def _lookup(self, kind, key, text):
+        payload = self.cache.get(kind, key)
+        if payload is not None:
+            intake_totals["cache_hits"] += 1
+            return payload
+
+        if self.queries >= self.max_queries:
+            intake_totals["budget_exhausted"] += 1
+            return self._prefix_fallback(kind, key)
+
+        # A superseded call cannot be interrupted mid-request, so wait for it
+        # rather than running two upstream queries for one session
+        if self._upstream is not None and not self._upstream.done():
+            await asyncio.wait([self._upstream])
+        delay = self._last_query_at + self.min_interval - time.monotonic()
+        if delay > 0:
+            await asyncio.sleep(delay)
+
+        # The key's token bucket is shared with its HTTP requests
+        policy = self.admission.get(kind)
+        if policy is not None and policy.try_charge(self.key) > 0:
+            intake_totals["rate_limited"] += 1
+            return self._prefix_fallback(kind, key)
+
+        self.queries += 1
+        intake_totals["queries"] += 1
+        self._last_query_at = time.monotonic()
+        lookup, _ = SUGGESTIONS[kind]
+        self._upstream = asyncio.ensure_future(asyncio.to_thread(lookup, text))
+        # Cache the result even if this lookup is superseded before it arrives
+        self._upstream.add_done_callback(lambda future: self._store(kind, key, future))
+        return await asyncio.shield(self._upstream)
+
+    def _prefix_fallback(self, kind, key):
+        payload = self.cache.longest_prefix(kind, key)
+        if payload is not None:
+            intake_totals["prefix_hits"] += 1
+        return payload
+
+    def _store(self, kind, key, future):
+        if not future.cancelled() and future.exception() is None and future.result() is not None:
+            self.cache.put(kind, key, future.result())
+
+    async def _push(self, kind, payload, text):
+        _, ranking_of = SUGGESTIONS[kind]
+        ranking = ranking_of(payload)
+        if self._rankings.get(kind) == ranking:
+            return
+        self._rankings[kind] = ranking
+        intake_totals["pushes"] += 1
+        await self.send({
+            "type": kind,
+            "text_length": len(text),
+            "queries_remaining": max(0, self.max_queries - self.queries),
+            **payload,
+        })
+
+
+def intake_stats():
+    """Active sessions, cache size and totals across all intake sessions."""
+    return {
+        "active_sessions": active_sessions,
+        "max_sessions": INTAKE_MAX_SESSIONS,
+        "max_sessions_per_key": INTAKE_MAX_SESSIONS_PER_KEY,
+        "keys_with_sessions": len(sessions_by_key),
+        "cached_suggestions": len(suggestion_cache),
+        **intake_totals,
+    }
@@ -0,0 +1,223 @@
+"""
+Shared helpers for LLM calls: compact prompt building, token budgeting,
+model tiering and per-call statistics.
+"""
+import math
+import os
+import threading
+import time
+from collections import deque
+from dotenv import load_dotenv
+from openai import OpenAI
+import instructor
+from .profiling import stage
+
+# tiktoken is optional; without it token counts are estimated from length
+try:
+    import tiktoken
+except ImportError:
+    tiktoken = None
+
+# Load environment variables
+load_dotenv()
+
+# Model tiers: simple cases go to the fast model, hard ones escalate
+LLM_FAST_MODEL = os.getenv("LLM_FAST_MODEL", "gpt-4.1-nano")
+LLM_STRONG_MODEL = os.getenv("LLM_STRONG_MODEL", "gpt-4.1-mini")
+# Escalate when the top category's rerank score is below this
+LLM_ESCALATE_BELOW_CONFIDENCE = float(os.getenv("LLM_ESCALATE_BELOW_CONFIDENCE", "0.5"))
+# Escalate when the user-provided text is longer than this many tokens
+LLM_ESCALATE_ABOVE_TOKENS = int(os.getenv("LLM_ESCALATE_ABOVE_TOKENS", "400"))
+# Upper bound on prompt tokens; grievance text and form fields are truncated to fit
+LLM_PROMPT_TOKEN_BUDGET = int(os.getenv("LLM_PROMPT_TOKEN_BUDGET", "1500"))
+LLM_RECENT_CALLS = int(os.getenv("LLM_RECENT_CALLS", "100"))
+
+_ins_client = None
+_encodings = {}
+_stats_lock = threading.Lock()
+_call_stats = {}
+_recent_calls = deque(maxlen=LLM_RECENT_CALLS)
+
+
+def get_llm_client():
+    """
+    Return the shared instructor-wrapped OpenAI client.
+
+    The OpenAI client honours OPENAI_BASE_URL, so calls can be pointed at a
+    local OpenAI-compatible endpoint.
+    """
+    global _ins_client
+    if _ins_client is None:
+        _ins_client = instructor.from_openai(OpenAI())
+    return _ins_client
+
+
+def count_tokens(text, model=LLM_STRONG_MODEL):
+    """Count tokens with tiktoken when available, otherwise estimate ~4 characters per token."""
+    if not text:
+        return 0
+    if tiktoken is not None:
+        if model not in _encodings:
+            try:
+                _encodings[model] = tiktoken.encoding_for_model(model)
+            except KeyError:
+                _encodings[model] = tiktoken.get_encoding("o200k_base")
+        return len(_encodings[model].encode(text))
+    return math.ceil(len(text) / 4)
+
+
+def truncate_to_budget(text, max_tokens, model=LLM_STRONG_MODEL):
+    """
+    Truncate text to roughly `max_tokens` tokens, keeping the start and the end.
+
+    Args:
+        text (str): Text to fit
+        max_tokens (int): Token budget for the text
+        model (str): Model whose tokenizer is used for counting
+
+    Returns:
+        str: The original text if it fits, otherwise a shortened version
+    """
+    text = text or ""
+    tokens = count_tokens(text, model)
+    if tokens <= max_tokens:
+        return text
+    if max_tokens <= 0:
+        return ""
+
+    # Scale by characters, then keep two thirds from the head and one third from the tail
+    keep = int(len(text) * max_tokens / tokens) - 10
+    head = max(0, keep * 2 // 3)
+    tail = max(0, keep - head)
+    return text[:head] + " [...] " + (text[-tail:] if tail else "")
+
+
+def compact_category(category):
+    """Reduce a category to the fields the LLM needs to judge the categorization."""
+    if not isinstance(category, dict):
+        return str(category or "")
+    parts = [category.get("concat_grievance_category") or ""]
+    if category.get("department_name"):
+        parts.append(f"Department: {category['department_name']}")
+    if category.get("description_of_grievance_category"):
+        parts.append(f"Description: {category['description_of_grievance_category']}")
+    return "\n".join(p for p in parts if p)
+
+
+def compact_fields(form_fields):
+    """
+    Render form fields one per line instead of the verbose multi-line format.
+
+    Example: `date_of_incident (date, required): When it happened`
+    """
+    lines = []
+    for field in form_fields:
+        line = f"{field.get('field_name', 'Unknown')} ({field.get('data_type', 'text')}"
+        line += ", required)" if field.get('mandatory') else ")"
+        if field.get('options'):
+            line += f" [{' | '.join(str(o) for o in field['options'])}]"
+        if field.get('description'):
+            line += f": {field['description']}"
+        lines.append(line)
+    return "\n".join(lines)
+
+
+def category_confidence(category):
+    """Rerank score of a category (falling back to the search score), or None."""
+    if not isinstance(category, dict):
+        return None
+    if category.get("rerank_score") is not None:
+        return category["rerank_score"]
+    return category.get("score")
+
+
+def choose_model(user_text_tokens=0, confidence=None):
+    """
+    Pick the model tier for a call.
+
+    Escalates to the strong model when the category match is low-confidence
+    or the user's text is long; everything else goes to the fast model.
+    """
+    if confidence is not None and confidence < LLM_ESCALATE_BELOW_CONFIDENCE:
+        return LLM_STRONG_MODEL
+    if user_text_tokens > LLM_ESCALATE_ABOVE_TOKENS:
+        return LLM_STRONG_MODEL
+    return LLM_FAST_MODEL
+
+
+def structured_completion(kind, model, response_model, system_prompt, prompt):
+    """
+    Run an instructor structured completion and record its token usage and latency.
+
+    Args:
+        kind (str): Name of the call site used to group statistics
+        model (str): Model to call
+        response_model: Pydantic model for the structured response
+        system_prompt (str): System message
+        prompt (str): User message
+
+    Returns:
+        The parsed response_model instance
+    """
+    estimated_prompt_tokens = count_tokens(system_prompt, model) + count_tokens(prompt, model)
+    started = time.perf_counter()
+    with stage(f"llm.{kind}"):
+        response, completion = get_llm_client().chat.completions.create_with_completion(
+            model=model,
+            response_model=response_model,
+            messages=[
+                {"role": "system", "content": system_prompt},
+                {"role": "user", "content": prompt}
+            ],
+        )
+    latency = time.perf_counter() - started
+
+    usage = getattr(completion, "usage", None)
+    record_call(
+        kind,
+        model,
+        prompt_tokens=getattr(usage, "prompt_tokens", None) or estimated_prompt_tokens,
+        completion_tokens=getattr(usage, "completion_tokens", None) or 0,
+        latency=latency,
+    )
+    return response
+
+
+def record_call(kind, model, prompt_tokens, completion_tokens, latency):
+    """Add one LLM call to the aggregate and recent-call statistics."""
+    with _stats_lock:
+        stats = _call_stats.setdefault(f"{kind}:{model}", {
+            "kind": kind,
+            "model": model,
+            "calls": 0,
+            "prompt_tokens": 0,
+            "completion_tokens": 0,
+            "total_latency_seconds": 0.0,
+            "max_latency_seconds": 0.0,
+        })
+        stats["calls"] += 1
+        stats["prompt_tokens"] += prompt_tokens
+        stats["completion_tokens"] += completion_tokens
+        stats["total_latency_seconds"] += latency
+        stats["max_latency_seconds"] = max(stats["max_latency_seconds"], latency)
+        _recent_calls.append({
+            "kind": kind,
+            "model": model,
+            "prompt_tokens": prompt_tokens,
+            "completion_tokens": completion_tokens,
+            "latency_seconds": latency,
+        })
+
+
+def llm_stats():
+    """Aggregate statistics per call site and model, plus the most recent calls."""
+    with _stats_lock:
+        aggregates = []
+        for stats in _call_stats.values():
+            calls = stats["calls"]
+            aggregates.append({
+                **stats,
+                "mean_prompt_tokens": stats["prompt_tokens"] / calls,
+                "mean_latency_seconds": stats["total_latency_seconds"] / calls,
+            })
+        return {"calls": aggregates, "recent": list(_recent_calls)}
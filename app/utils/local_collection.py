@@ -0,0 +1,225 @@
+"""
+Offline stand-ins for the Weaviate category collection.
+
+These objects expose the `collection.query.hybrid(...)` call used by
+`fetch_category`, so categorization can be replayed without network access:
+
+- LocalCategoryCollection searches an exported copy of the collection. Keyword
+  scoring is BM25 and the vector side is approximated with TF-IDF cosine;
+  results are fused by min-max normalised score like Weaviate's relative score
+  fusion, and reranking is approximated by TF-IDF similarity to the rerank
+  property.
+- RecordingCollection wraps the live collection and records every response.
+- ReplayCollection serves recorded responses, reporting the recorded latency,
+  and raises MissingRecordingError for queries that were never recorded.
+
+Every collection sets `last_call` to {'latency', 'bytes'} after each query.
+"""
+import json
+import math
+import re
+import time
+from collections import Counter
+from types import SimpleNamespace
+
+# Properties used as the searchable text of a category
+SEARCH_PROPERTIES = [
+    "concat_Grievance_Category",
+    "description_of_Grievance_Category",
+    "category",
+    "sub_Category_1",
+    "sub_Category_2",
+    "sub_Category_3",
+    "sub_Category_4",
+    "sub_Category_5",
+    "sub_Category_6",
+]
+
+BM25_K1 = 1.2
+BM25_B = 0.75
+
+
+def tokenize(text):
+    return re.findall(r"[a-z0-9]+", (text or "").lower())
+
+
+def _serialize_objects(objects):
+    return [
+        {
+            "properties": obj.properties,
+            "score": getattr(obj.metadata, "score", None),
+            "rerank_score": getattr(obj.metadata, "rerank_score", None),
+        }
+        for obj in objects
+    ]
+
+
+def _deserialize_objects(data):
+    return [
+        SimpleNamespace(
+            properties=item["properties"],
+            metadata=SimpleNamespace(score=item.get("score"), rerank_score=item.get("rerank_score")),
+        )
+        for item in data
+    ]
+
+
+def _payload_bytes(serialized):
+    return len(json.dumps(serialized, default=str).encode("utf-8"))
+
+
+def _call_key(query, alpha, limit, rerank):
+    return json.dumps([query, alpha, limit, rerank.prop if rerank is not None else None])
+
+
+def export_collection(live_collection, path):
+    """
+    Write every object of a live Weaviate collection to a JSON file.
+
+    Args:
+        live_collection: Weaviate collection to export
+        path (str): Output file path
+
+    Returns:
+        int: Number of objects exported
+    """
+    objects = [{"properties": obj.properties} for obj in live_collection.iterator()]
+    with open(path, "w") as f:
+        json.dump(objects, f, default=str)
+    return len(objects)
+
+
+class LocalCategoryCollection:
+    """In-memory hybrid search over an exported copy of the category collection."""
+
+    def __init__(self, objects):
+        self.objects = [obj.get("properties", obj) for obj in objects]
+        self.query = SimpleNamespace(hybrid=self.hybrid)
+        self.last_call = None
+
+        documents = [tokenize(" ".join(str(o.get(p) or "") for p in SEARCH_PROPERTIES)) for o in self.objects]
+        self._term_counts = [Counter(doc) for doc in documents]
+        self._lengths = [len(doc) for doc in documents]
+        self._avg_length = sum(self._lengths) / len(documents) if documents else 0
+
+        document_frequency = Counter()
+        for counts in self._term_counts:
+            document_frequency.update(counts.keys())
+        total = len(documents)
+        self._idf = {t: math.log(1 + (total - n + 0.5) / (n + 0.5)) for t, n in document_frequency.items()}
+        self._vectors = [self._tfidf(counts) for counts in self._term_counts]
+
+    @classmethod
+    def load(cls, path):
+        """Load a collection exported with `export_collection`."""
+        with open(path) as f:
+            return cls(json.load(f))
+
+    def _tfidf(self, counts):
+        vector = {t: (1 + math.log(c)) * self._idf.get(t, 0.0) for t, c in counts.items()}
+        norm = math.sqrt(sum(v * v for v in vector.values())) or 1.0
+        return {t: v / norm for t, v in vector.items()}
+
+    def _cosine(self, query_vector, vector):
+        return sum(w * vector.get(t, 0.0) for t, w in query_vector.items())
+
+    def _bm25(self, query_terms, index):
+        counts = self._term_counts[index]
+        length_norm = BM25_K1 * (1 - BM25_B + BM25_B * self._lengths[index] / (self._avg_length or 1))
+        score = 0.0
+        for term in query_terms:
+            tf = counts.get(term, 0)
+            if tf:
+                score += self._idf[term] * tf * (BM25_K1 + 1) / (tf + length_norm)
+        return score
+
+    @staticmethod
+    def _normalize(scores):
+        low, high = min(scores), max(scores)
+        if high == low:
+            return [1.0 if high > 0 else 0.0 for _ in scores]
+        return [(s - low) / (high - low) for s in scores]
+
+    def hybrid(self, query, alpha=0.75, limit=10, rerank=None, **kwargs):
+        started = time.perf_counter()
+        query_terms = tokenize(query)
+        query_vector = self._tfidf(Counter(query_terms))
+
+        vector_scores = self._normalize([self._cosine(query_vector, v) for v in self._vectors] or [0.0])
+        keyword_scores = self._normalize([self._bm25(query_terms, i) for i in range(len(self.objects))] or [0.0])
+        fused = [
+            (alpha * vector_scores[i] + (1 - alpha) * keyword_scores[i], i)
+            for i in range(len(self.objects))
+        ]
+        fused.sort(key=lambda item: item[0], reverse=True)
+
+        rerank_query_vector = self._tfidf(Counter(tokenize(rerank.query or query))) if rerank is not None else None
+        results = []
+        for score, index in fused[:limit]:
+            properties = self.objects[index]
+            rerank_score = None
+            if rerank is not None:
+                rerank_vector = self._tfidf(Counter(tokenize(str(properties.get(rerank.prop) or ""))))
+                rerank_score = self._cosine(rerank_query_vector, rerank_vector)
+            results.append(SimpleNamespace(
+                properties=properties,
+                metadata=SimpleNamespace(score=score, rerank_score=rerank_score),
+            ))
+        if rerank is not None:
+            results.sort(key=lambda obj: obj.metadata.rerank_score, reverse=True)
+
+        self.last_call = {
+            "latency": time.perf_counter() - started,
+            "bytes": _payload_bytes(_serialize_objects(results)),
+        }
+        return SimpleNamespace(objects=results)
+
+
+class RecordingCollection:
+    """Wrap a live collection and record each hybrid query's response and latency."""
+
+    def __init__(self, live_collection):
+        self.live_collection = live_collection
+        self.recordings = {}
+        self.query = SimpleNamespace(hybrid=self.hybrid)
+        self.last_call = None
+
+    def hybrid(self, query, alpha=0.75, limit=10, rerank=None, **kwargs):
+        started = time.perf_counter()
+        response = self.live_collection.query.hybrid(query=query, alpha=alpha, limit=limit, rerank=rerank, **kwargs)
+        latency = time.perf_counter() - started
+
+        serialized = _serialize_objects(response.objects)
+        self.last_call = {"latency": latency, "bytes": _payload_bytes(serialized)}
+        self.recordings[_call_key(query, alpha, limit, rerank)] = {"objects": serialized, **self.last_call}
+        return response
+
+    def save(self, path):
+        with open(path, "w") as f:
+            json.dump(self.recordings, f, default=str)
+
+
+class MissingRecordingError(LookupError):
+    """A replayed query has no recorded response."""
+
+
+class ReplayCollection:
+    """Serve responses recorded by RecordingCollection."""
+
+    def __init__(self, recordings):
+        self.recordings = recordings
+        self.query = SimpleNamespace(hybrid=self.hybrid)
+        self.last_call = None
+
+    @classmethod
+    def load(cls, path):
+        with open(path) as f:
+            return cls(json.load(f))
+
+    def hybrid(self, query, alpha=0.75, limit=10, rerank=None, **kwargs):
+        key = _call_key(query, alpha, limit, rerank)
+        if key not in self.recordings:
+            raise MissingRecordingError(f"No recording for query {key}")
+        recording = self.recordings[key]
+        self.last_call = {"latency": recording["latency"], "bytes": recording["bytes"]}
+        return SimpleNamespace(objects=_deserialize_objects(recording["objects"]))
@@ -0,0 +1,180 @@
+"""
+Lightweight production diagnostics: a sampling profiler, event-loop lag
+measurement, in-flight request tracking and a ring buffer of slow requests
+with per-stage timings.
+
+Nothing here runs in the background. The profiler and lag probe only run
+while an admin request asks for them, and request tracking costs a dict
+insert and a context variable per request.
+"""
+import asyncio
+import contextvars
+import itertools
+import os
+import sys
+import threading
+import time
+from collections import Counter, deque
+from contextlib import contextmanager
+from dotenv import load_dotenv
+
+# Load environment variables
+load_dotenv()
+
+SLOW_REQUEST_THRESHOLD_MS = float(os.getenv("SLOW_REQUEST_THRESHOLD_MS", "1000"))
+SLOW_REQUEST_BUFFER_SIZE = int(os.getenv("SLOW_REQUEST_BUFFER_SIZE", "100"))
+
+# Stage timings of the current request (None outside a tracked request)
+_current_stages = contextvars.ContextVar("current_stages", default=None)
+_profile_lock = threading.Lock()
+
+
+@contextmanager
+def stage(name):
+    """
+    Time a block of work as a named stage of the current request.
+
+    Durations are accumulated per stage name, so repeated calls add up. The
+    timings survive `asyncio.to_thread` because the context is copied into the
+    worker thread. Outside a tracked request this is a no-op.
+    """
+    stages = _current_stages.get()
+    if stages is None:
+        yield
+        return
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        stages[name] = stages.get(name, 0.0) + (time.perf_counter() - started) * 1000
+
+
+class RequestTracker:
+    """In-flight requests and a ring buffer of recent requests slower than a threshold."""
+
+    def __init__(self, threshold_ms=SLOW_REQUEST_THRESHOLD_MS, buffer_size=SLOW_REQUEST_BUFFER_SIZE):
+        self.threshold_ms = threshold_ms
+        self.in_flight = {}
+        self.slow_requests = deque(maxlen=buffer_size)
+        self._ids = itertools.count(1)
+
+    def start(self, method, path):
+        """Register a request and start collecting its stage timings."""
+        request_id = next(self._ids)
+        self.in_flight[request_id] = {
+            "method": method,
+            "path": path,
+            "started": time.time(),
+            "started_monotonic": time.perf_counter(),
+            "stages": {},
+        }
+        _current_stages.set(self.in_flight[request_id]["stages"])
+        return request_id
+
+    def finish(self, request_id, status_code):
+        """Unregister a request and keep it if it was slower than the threshold."""
+        request = self.in_flight.pop(request_id, None)
+        if request is None:
+            return
+        duration_ms = (time.perf_counter() - request["started_monotonic"]) * 1000
+        if duration_ms >= self.threshold_ms:
+            self.slow_requests.append({
+                "method": request["method"],
+                "path": request["path"],
+                "status_code": status_code,
+                "started": request["started"],
+                "duration_ms": duration_ms,
+                "stages_ms": dict(request["stages"]),
+            })
+
+    def in_flight_snapshot(self):
+        """Current requests, oldest first, with their age and stages so far."""
+        now = time.perf_counter()
+        requests = [
+            {
+                "id": request_id,
+                "method": request["method"],
+                "path": request["path"],
+                "age_ms": (now - request["started_monotonic"]) * 1000,
+                "stages_ms": dict(request["stages"]),
+            }
+            for request_id, request in list(self.in_flight.items())
+        ]
+        return sorted(requests, key=lambda r: r["age_ms"], reverse=True)
+
+    def slow_snapshot(self):
+        """Recent slow requests, slowest first."""
+        return sorted(self.slow_requests, key=lambda r: r["duration_ms"], reverse=True)
+
+
+request_tracker = RequestTracker()
+
+
+def _frame_name(frame):
+    code = frame.f_code
+    return f"{code.co_name} ({os.path.basename(code.co_filename)}:{frame.f_lineno})"
+
+
+def sample_stacks(seconds, interval=0.005):
+    """
+    Sample every thread's stack for `seconds` and return collapsed stacks.
+
+    The output has one `thread;outer;...;inner count` line per distinct stack,
+    which flamegraph.pl, speedscope and similar tools accept. Only one profile
+    can run at a time.
+
+    Args:
+        seconds (float): How long to sample
+        interval (float): Seconds between samples
+
+    Returns:
+        str: Collapsed stacks, or None if another profile is already running
+    """
+    if not _profile_lock.acquire(blocking=False):
+        return None
+    try:
+        own_thread = threading.get_ident()
+        counts = Counter()
+        deadline = time.perf_counter() + seconds
+        while time.perf_counter() < deadline:
+            names = {t.ident: t.name for t in threading.enumerate()}
+            for thread_id, frame in sys._current_frames().items():
+                if thread_id == own_thread:
+                    continue
+                stack = []
+                while frame is not None:
+                    stack.append(_frame_name(frame))
+                    frame = frame.f_back
+                stack.append(names.get(thread_id, str(thread_id)))
+                counts[";".join(reversed(stack))] += 1
+            time.sleep(interval)
+        return "".join(f"{stack} {count}\n" for stack, count in counts.most_common())
+    finally:
+        _profile_lock.release()
+
+
+async def measure_loop_lag(seconds=1.0, interval=0.05):
+    """
+    Measure how late the event loop wakes up from short sleeps.
+
+    Args:
+        seconds (float): How long to measure
+        interval (float): Sleep length per probe
+
+    Returns:
+        dict: Number of samples and mean/p95/max lag in milliseconds
+    """
+    lags = []
+    deadline = time.perf_counter() + seconds
+    while time.perf_counter() < deadline:
+        started = time.perf_counter()
+        await asyncio.sleep(interval)
+        lags.append(max(0.0, (time.perf_counter() - started - interval) * 1000))
+
+    lags.sort()
+    return {
+        "samples": len(lags),
+        "mean_ms": sum(lags) / len(lags) if lags else 0.0,
+        "p95_ms": lags[min(len(lags) - 1, int(len(lags) * 0.95))] if lags else 0.0,
+        "max_ms": lags[-1] if lags else 0.0,
+    }
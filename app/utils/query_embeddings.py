@@ -0,0 +1,318 @@
+"""
+Client-side query embeddings shared by category and FAQ search.
+
+Without this, Weaviate vectorizes the query text on every hybrid search, once
+per collection. With QUERY_EMBEDDING_CACHE enabled, the vector is computed
+here once per whitespace-normalized text, kept in a bounded in-memory LRU
+cache and optionally in an mmap-backed file (QUERY_EMBEDDING_STORE) that
+survives restarts and can be shared by worker processes on the same host
+(access is serialized with flock on a sidecar `.lock` file), and passed to
+`query.hybrid(vector=...)` for both searches.
+
+QUERY_EMBEDDING_MODEL (and QUERY_EMBEDDING_DIMENSIONS, if set) must match the
+vectorizer configured on the Weaviate collections, otherwise the vector
+search compares vectors from different spaces.
+"""
+import hashlib
+import mmap
+import os
+import struct
+import threading
+import time
+from array import array
+from collections import OrderedDict
+from contextlib import contextmanager
+from dotenv import load_dotenv
+from openai import OpenAI
+from .llm import record_call
+from .profiling import stage
+
+# fcntl is POSIX-only; without it the store must not be shared between processes
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+# Load environment variables
+load_dotenv()
+
+QUERY_EMBEDDING_CACHE = os.getenv("QUERY_EMBEDDING_CACHE", "false").lower() in ("1", "true", "yes")
+QUERY_EMBEDDING_MODEL = os.getenv("QUERY_EMBEDDING_MODEL", "text-embedding-3-small")
+QUERY_EMBEDDING_DIMENSIONS = int(os.getenv("QUERY_EMBEDDING_DIMENSIONS", "0")) or None
+QUERY_EMBEDDING_CACHE_SIZE = int(os.getenv("QUERY_EMBEDDING_CACHE_SIZE", "10000"))
+# Optional file for vectors that outlive the process; empty disables it
+QUERY_EMBEDDING_STORE = os.getenv("QUERY_EMBEDDING_STORE", "")
+QUERY_EMBEDDING_STORE_SLOTS = int(os.getenv("QUERY_EMBEDDING_STORE_SLOTS", "20000"))
+# How long a search waits for a concurrent embedding of the same text
+QUERY_EMBEDDING_WAIT_SECONDS = float(os.getenv("QUERY_EMBEDDING_WAIT_SECONDS", "10"))
+
+_MAGIC = b"GRMQEMB1"
+_HEADER = struct.Struct("<8sII")  # magic, dimensions, slots
+_DIGEST_SIZE = 20
+_EMPTY_DIGEST = bytes(_DIGEST_SIZE)
+_MAX_PROBES = 8
+
+
+def normalize_query(text):
+    """Collapse whitespace; the embedding is computed from exactly this string."""
+    return " ".join((text or "").split())
+
+
+class EmbeddingStore:
+    """
+    Fixed-size on-disk hash table of vectors, memory-mapped.
+
+    Each slot holds a SHA-1 digest of the text followed by the float32
+    vector. Lookups probe up to eight slots from the digest's home slot;
+    when all are taken, the home slot is overwritten, so the file never
+    grows.
+
+    Several processes may open the same file. Reads take a shared flock and
+    writes an exclusive one on `<path>.lock`, so no process sees a slot whose
+    digest and vector come from different puts. A file with the wrong layout
+    is replaced by renaming a new file over it rather than truncated in
+    place, since truncating a file another process has mapped would crash
+    that process with SIGBUS; such a process keeps using the old file until
+    it reopens the store.
+
+    Args:
+        path (str): File to create or reopen
+        dimensions (int): Vector length; a file with another length is recreated
+        slots (int): Number of vectors the file can hold
+    """
+
+    def __init__(self, path, dimensions, slots=QUERY_EMBEDDING_STORE_SLOTS):
+        self.path = path
+        self.dimensions = dimensions
+        self.slots = slots
+        self.slot_size = _DIGEST_SIZE + 4 * dimensions
+        size = _HEADER.size + slots * self.slot_size
+
+        self._lock_file = open(f"{path}.lock", "a+b")
+        with self._locked(shared=False):
+            reuse = False
+            if os.path.exists(path) and os.path.getsize(path) == size:
+                with open(path, "rb") as f:
+                    reuse = _HEADER.unpack(f.read(_HEADER.size)) == (_MAGIC, dimensions, slots)
+            if not reuse:
+                print(f"Creating query embedding store {path} ({slots} slots of {dimensions} dimensions)")
+                temporary = f"{path}.{os.getpid()}.tmp"
+                with open(temporary, "wb") as f:
+                    f.write(_HEADER.pack(_MAGIC, dimensions, slots))
+                    f.truncate(size)
+                os.replace(temporary, path)
+
+            self._file = open(path, "r+b")
+            self._map = mmap.mmap(self._file.fileno(), size)
+
+    @contextmanager
+    def _locked(self, shared):
+        if fcntl is None:
+            yield
+            return
+        fcntl.flock(self._lock_file.fileno(), fcntl.LOCK_SH if shared else fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(self._lock_file.fileno(), fcntl.LOCK_UN)
+
+    def _offsets(self, digest):
+        home = int.from_bytes(digest[:8], "little") % self.slots
+        for probe in range(_MAX_PROBES):
+            yield _HEADER.size + ((home + probe) % self.slots) * self.slot_size
+
+    def get(self, digest):
+        with self._locked(shared=True):
+            for offset in self._offsets(digest):
+                stored = self._map[offset:offset + _DIGEST_SIZE]
+                if stored == digest:
+                    vector = array("f")
+                    vector.frombytes(self._map[offset + _DIGEST_SIZE:offset + self.slot_size])
+                    return vector
+                if stored == _EMPTY_DIGEST:
+                    return None
+        return None
+
+    def put(self, digest, vector):
+        with self._locked(shared=False):
+            target = None
+            for offset in self._offsets(digest):
+                stored = self._map[offset:offset + _DIGEST_SIZE]
+                if stored in (digest, _EMPTY_DIGEST):
+                    target = offset
+                    break
+            if target is None:
+                target = next(self._offsets(digest))
+            self._map[target + _DIGEST_SIZE:target + self.slot_size] = vector.tobytes()
+            self._map[target:target + _DIGEST_SIZE] = digest
+
+    def close(self):
+        self._map.close()
+        self._file.close()
+        self._lock_file.close()
+
+
+class QueryEmbeddingCache:
+    """
+    Bounded LRU cache of query vectors in front of an optional EmbeddingStore.
+
+    Safe to use from the worker threads that run Weaviate searches.
+
+    Args:
+        model (str): OpenAI embedding model
+        dimensions (int, optional): Requested embedding size, if the model supports it
+        max_entries (int): Vectors kept in memory
+        store_path (str, optional): File for the mmap-backed store
+    """
+
+    def __init__(self, model=QUERY_EMBEDDING_MODEL, dimensions=QUERY_EMBEDDING_DIMENSIONS,
+                 max_entries=QUERY_EMBEDDING_CACHE_SIZE, store_path=QUERY_EMBEDDING_STORE or None):
+        self.model = model
+        self.dimensions = dimensions
+        self.max_entries = max_entries
+        self.store_path = store_path
+        self._store = None
+        self._entries = OrderedDict()
+        self._pending = {}
+        self._lock = threading.Lock()
+        self._client = None
+        self.stats = {"memory_hits": 0, "store_hits": 0, "embedded": 0, "errors": 0}
+
+    def _digest(self, text):
+        return hashlib.sha1(f"{self.model}:{self.dimensions}:{text}".encode()).digest()
+
+    def _remember(self, digest, vector):
+        self._entries[digest] = vector
+        self._entries.move_to_end(digest)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def _cached(self, digest):
+        # Called with the lock held
+        vector = self._entries.get(digest)
+        if vector is not None:
+            self._entries.move_to_end(digest)
+            self.stats["memory_hits"] += 1
+            return vector
+        self._open_store()
+        if self._store is not None:
+            vector = self._store.get(digest)
+            if vector is not None:
+                self._remember(digest, vector)
+                self.stats["store_hits"] += 1
+        return vector
+
+    def _open_store(self, dimensions=None):
+        # Called with the lock held; without dimensions, only an existing file is opened
+        if self._store is not None or not self.store_path:
+            return
+        try:
+            if dimensions is None:
+                if not os.path.exists(self.store_path):
+                    return
+                with open(self.store_path, "rb") as f:
+                    magic, dimensions, _ = _HEADER.unpack(f.read(_HEADER.size))
+                if magic != _MAGIC:
+                    return
+            self._store = EmbeddingStore(self.store_path, dimensions)
+        except (OSError, struct.error) as e:
+            print(f"Query embedding store disabled: {e}")
+            self.store_path = None
+
+    def _embed(self, text):
+        if self._client is None:
+            self._client = OpenAI()
+        kwargs = {"dimensions": self.dimensions} if self.dimensions else {}
+        started = time.perf_counter()
+        with stage("embedding.query"):
+            response = self._client.embeddings.create(model=self.model, input=text, **kwargs)
+        usage = getattr(response, "usage", None)
+        record_call(
+            "query_embedding",
+            self.model,
+            prompt_tokens=getattr(usage, "prompt_tokens", None) or 0,
+            completion_tokens=0,
+            latency=time.perf_counter() - started,
+        )
+        return array("f", response.data[0].embedding)
+
+    def get(self, text):
+        """
+        Vector for a query text, embedding it only on a cache miss.
+
+        Args:
+            text (str): Query text
+
+        Returns:
+            list: The query vector, or None if it could not be computed
+        """
+        text = normalize_query(text)
+        if not text:
+            return None
+        digest = self._digest(text)
+
+        with self._lock:
+            vector = self._cached(digest)
+            if vector is not None:
+                return vector.tolist()
+            pending = self._pending.get(digest)
+            if pending is None:
+                self._pending[digest] = threading.Event()
+
+        if pending is not None:
+            # Another thread, e.g. the other search of the same request, is
+            # already embedding this text; use its result instead
+            pending.wait(QUERY_EMBEDDING_WAIT_SECONDS)
+            with self._lock:
+                vector = self._cached(digest)
+            return vector.tolist() if vector is not None else None
+
+        # Embed outside the lock so other texts are not held up
+        try:
+            vector = self._embed(text)
+        except Exception as e:
+            print(f"Error embedding query, falling back to Weaviate vectorization: {e}")
+            with self._lock:
+                self.stats["errors"] += 1
+            return None
+        else:
+            with self._lock:
+                self.stats["embedded"] += 1
+                self._remember(digest, vector)
+                self._open_store(len(vector))
+                if self._store is not None and self._store.dimensions == len(vector):
+                    self._store.put(digest, vector)
+            return vector.tolist()
+        finally:
+            with self._lock:
+                self._pending.pop(digest).set()
+
+    def close(self):
+        """Unmap the on-disk store, if open."""
+        with self._lock:
+            if self._store is not None:
+                self._store.close()
+                self._store = None
+
+    def snapshot(self):
+        """Cache configuration, size and hit counters."""
+        with self._lock:
+            return {
+                "enabled": QUERY_EMBEDDING_CACHE,
+                "model": self.model,
+                "dimensions": self.dimensions,
+                "cached": len(self._entries),
+                "max_entries": self.max_entries,
+                "store_path": self.store_path,
+                **self.stats,
+            }
+
+
+query_embeddings = QueryEmbeddingCache()
+
+
+def get_query_vector(text):
+    """Cached vector for a query when QUERY_EMBEDDING_CACHE is enabled, otherwise None."""
+    if not QUERY_EMBEDDING_CACHE:
+        return None
+    return query_embeddings.get(text)
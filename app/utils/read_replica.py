@@ -0,0 +1,293 @@
+"""
+Optional local SQLite read replica of the Grievance and Users tables.
+
+Set READ_REPLICA_PATH (a file, or ":memory:") to enable it. A background task
+copies both tables once and then pulls records changed since the last sync
+every READ_REPLICA_SYNC_INTERVAL seconds, keyed on the table's update
+timestamp. Writers stamp updated_at before their Xata call commits, so each
+incremental sync re-reads READ_REPLICA_SYNC_LAG seconds before the newest
+timestamp seen; a record committed later than that is missed. Our own create
+and update handlers, the categorization queue, follow-up sessions and the
+reclassification backfill also write through to it.
+
+Reads are served from the replica only while the last successful sync of the
+table is at most READ_REPLICA_MAX_STALENESS seconds old; otherwise, and for
+records the replica does not have, callers fall back to Xata. Records deleted
+in Xata are not removed from the replica.
+"""
+import asyncio
+import json
+import os
+import sqlite3
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+from dotenv import load_dotenv
+
+# Load environment variables
+load_dotenv()
+
+READ_REPLICA_PATH = os.getenv("READ_REPLICA_PATH", "")
+READ_REPLICA_MAX_STALENESS = float(os.getenv("READ_REPLICA_MAX_STALENESS", "30"))
+READ_REPLICA_SYNC_INTERVAL = float(os.getenv("READ_REPLICA_SYNC_INTERVAL", "5"))
+READ_REPLICA_PAGE_SIZE = int(os.getenv("READ_REPLICA_PAGE_SIZE", "200"))
+# Longest time between a writer stamping updated_at and its Xata write committing
+READ_REPLICA_WRITE_LATENCY = float(os.getenv("READ_REPLICA_WRITE_LATENCY", "30"))
+# How far before the newest seen timestamp each incremental sync starts
+READ_REPLICA_SYNC_LAG = float(os.getenv("READ_REPLICA_SYNC_LAG", str(READ_REPLICA_SYNC_INTERVAL + READ_REPLICA_WRITE_LATENCY)))
+
+# Replicated tables and the column incremental syncs are keyed on. Users has
+# no updated_at column, so Xata's own record metadata is used instead.
+REPLICA_TABLES = {
+    "Grievance": "updated_at",
+    "Users": "xata.updatedAt",
+}
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS records (
+    table_name TEXT NOT NULL,
+    id TEXT NOT NULL,
+    user_id TEXT,
+    data TEXT NOT NULL,
+    PRIMARY KEY (table_name, id)
+);
+CREATE INDEX IF NOT EXISTS records_user ON records (table_name, user_id, id);
+CREATE TABLE IF NOT EXISTS sync_state (
+    table_name TEXT PRIMARY KEY,
+    watermark TEXT,
+    synced_at REAL
+);
+"""
+
+
+def _column_value(record, column):
+    # Dotted names reach into nested objects, e.g. "xata.updatedAt"
+    value = record
+    for part in column.split("."):
+        value = value.get(part) if isinstance(value, dict) else None
+    # Link columns come back as {"id": ...}
+    if isinstance(value, dict) and "id" in value:
+        value = value["id"]
+    return value
+
+
+def _parse_timestamp(value):
+    # Xata trims trailing zeros of fractional seconds, so strings do not compare reliably
+    try:
+        parsed = datetime.fromisoformat(str(value))
+    except ValueError:
+        return None
+    if parsed.tzinfo is not None:
+        parsed = parsed.astimezone(timezone.utc).replace(tzinfo=None)
+    return parsed
+
+
+def _format_timestamp(value):
+    return value.strftime("%Y-%m-%dT%H:%M:%S.%fZ")
+
+
+class ReadReplica:
+    """
+    SQLite copy of Xata tables for low-latency reads.
+
+    Args:
+        path (str): SQLite database file, ":memory:", or empty to disable
+        max_staleness (float): Seconds since the last sync within which reads are served
+        page_size (int): Records fetched per Xata query while syncing
+        tables (dict): Table name to the column incremental syncs are keyed on
+        sync_lag (float): Seconds before the newest seen timestamp each incremental sync starts
+    """
+
+    def __init__(self, path=READ_REPLICA_PATH, max_staleness=READ_REPLICA_MAX_STALENESS,
+                 page_size=READ_REPLICA_PAGE_SIZE, tables=REPLICA_TABLES, sync_lag=READ_REPLICA_SYNC_LAG):
+        self.path = path
+        self.max_staleness = max_staleness
+        self.page_size = page_size
+        self.tables = tables
+        self.sync_lag = sync_lag
+        self._connection = None
+        self._lock = threading.Lock()
+        self.stats = {"replica_reads": 0, "stale_fallbacks": 0, "miss_fallbacks": 0, "synced_records": 0, "sync_errors": 0}
+
+    @property
+    def enabled(self):
+        return bool(self.path)
+
+    def _db(self):
+        # Called with the lock held
+        if self._connection is None:
+            self._connection = sqlite3.connect(self.path, check_same_thread=False)
+            if self.path != ":memory:":
+                self._connection.execute("PRAGMA journal_mode=WAL")
+            self._connection.executescript(_SCHEMA)
+        return self._connection
+
+    def _state(self, table):
+        with self._lock:
+            row = self._db().execute(
+                "SELECT watermark, synced_at FROM sync_state WHERE table_name = ?", (table,)
+            ).fetchone()
+        return row or (None, None)
+
+    def is_fresh(self, table):
+        """True if the table was synced within the staleness bound."""
+        if not self.enabled:
+            return False
+        _, synced_at = self._state(table)
+        fresh = synced_at is not None and time.time() - synced_at <= self.max_staleness
+        if not fresh:
+            self.stats["stale_fallbacks"] += 1
+        return fresh
+
+    def upsert(self, table, records):
+        """Insert or replace full records, e.g. after creating them in Xata."""
+        if not self.enabled or not records:
+            return
+        rows = [(table, r["id"], _column_value(r, "user_id"), json.dumps(r, default=str)) for r in records]
+        with self._lock:
+            db = self._db()
+            with db:
+                db.executemany("INSERT OR REPLACE INTO records (table_name, id, user_id, data) VALUES (?, ?, ?, ?)", rows)
+
+    def update(self, table, record_id, fields):
+        """Merge updated fields into a replicated record; unknown records are left to the sync."""
+        if not self.enabled:
+            return
+        with self._lock:
+            db = self._db()
+            row = db.execute("SELECT data FROM records WHERE table_name = ? AND id = ?", (table, record_id)).fetchone()
+            if row is None:
+                return
+            record = {**json.loads(row[0]), **fields}
+            with db:
+                db.execute(
+                    "UPDATE records SET user_id = ?, data = ? WHERE table_name = ? AND id = ?",
+                    (_column_value(record, "user_id"), json.dumps(record, default=str), table, record_id),
+                )
+
+    def get(self, table, record_id):
+        """
+        A record from the replica.
+
+        Returns:
+            dict: The record, or None if the replica is disabled, stale or does not have it
+        """
+        if not self.is_fresh(table):
+            return None
+        with self._lock:
+            row = self._db().execute(
+                "SELECT data FROM records WHERE table_name = ? AND id = ?", (table, record_id)
+            ).fetchone()
+        if row is None:
+            self.stats["miss_fallbacks"] += 1
+            return None
+        self.stats["replica_reads"] += 1
+        return json.loads(row[0])
+
+    def find_by_user(self, table, user_id, offset=0, limit=None):
+        """Records linked to a user, ordered by id; call only after is_fresh()."""
+        with self._lock:
+            rows = self._db().execute(
+                "SELECT data FROM records WHERE table_name = ? AND user_id = ? ORDER BY id LIMIT ? OFFSET ?",
+                (table, user_id, -1 if limit is None else limit, offset),
+            ).fetchall()
+        self.stats["replica_reads"] += 1
+        return [json.loads(row[0]) for row in rows]
+
+    def count_by_user(self, table, user_id):
+        """Number of records linked to a user; call only after is_fresh()."""
+        with self._lock:
+            (count,) = self._db().execute(
+                "SELECT COUNT(*) FROM records WHERE table_name = ? AND user_id = ?", (table, user_id)
+            ).fetchone()
+        return count
+
+    def sync_table(self, xata, table):
+        """
+        Pull records changed since the last sync of `table` from Xata.
+
+        The first sync copies the whole table. Later syncs fetch records whose
+        update timestamp is at or after the newest one seen minus
+        `sync_lag`, so records stamped before an earlier sync but committed
+        after it are still picked up.
+
+        Returns:
+            int: Number of records written
+        """
+        column = self.tables[table]
+        stored_watermark, _ = self._state(table)
+        watermark = _parse_timestamp(stored_watermark) if stored_watermark else None
+        started = time.time()
+
+        if watermark is None:
+            query = {"sort": [{"id": "asc"}], "page": {"size": self.page_size}}
+        else:
+            since = watermark - timedelta(seconds=self.sync_lag)
+            query = {
+                "filter": {column: {"$ge": _format_timestamp(since)}},
+                "sort": [{column: "asc"}],
+                "page": {"size": self.page_size},
+            }
+
+        synced = 0
+        while True:
+            resp = xata.data().query(table, query)
+            if not resp.is_success():
+                raise RuntimeError(f"Failed to sync {table}: {resp}")
+            records = resp.get("records", [])
+            self.upsert(table, records)
+            synced += len(records)
+            for record in records:
+                value = _column_value(record, column)
+                value = _parse_timestamp(value) if value is not None else None
+                if value is not None and (watermark is None or value > watermark):
+                    watermark = value
+            if not resp.has_more_results() or not records:
+                break
+            query = {"page": {"size": self.page_size, "after": resp.get_cursor()}}
+
+        # Freshness counts from when the sync started, since later changes may be missing
+        with self._lock:
+            db = self._db()
+            with db:
+                db.execute(
+                    "INSERT OR REPLACE INTO sync_state (table_name, watermark, synced_at) VALUES (?, ?, ?)",
+                    (table, _format_timestamp(watermark) if watermark else None, started),
+                )
+        self.stats["synced_records"] += synced
+        return synced
+
+    def sync(self, xata):
+        """Sync every replicated table, logging failures instead of raising."""
+        for table in self.tables:
+            try:
+                self.sync_table(xata, table)
+            except Exception as e:
+                self.stats["sync_errors"] += 1
+                print(f"Error syncing read replica table {table}: {e}")
+
+    async def run(self, xata, interval=READ_REPLICA_SYNC_INTERVAL):
+        """Sync in a worker thread every `interval` seconds until cancelled."""
+        while True:
+            await asyncio.to_thread(self.sync, xata)
+            await asyncio.sleep(interval)
+
+    def snapshot(self):
+        """Sync state per table and read counters."""
+        tables = {}
+        for table in self.tables:
+            watermark, synced_at = self._state(table) if self.enabled else (None, None)
+            tables[table] = {
+                "watermark": watermark,
+                "seconds_since_sync": time.time() - synced_at if synced_at else None,
+            }
+        return {"enabled": self.enabled, "max_staleness": self.max_staleness, "tables": tables, **self.stats}
+
+    def close(self):
+        with self._lock:
+            if self._connection is not None:
+                self._connection.close()
+                self._connection = None
+
+
+read_replica = ReadReplica()
@@ -0,0 +1,280 @@
+"""
+In-memory stand-in for the parts of XataClient used by the GRM API.
+
+Used for benchmarks and dry runs without network access. Queries walk a
+sorted index, like a database would: a cursor page seeks directly to the last
+returned key, while an offset page walks past every skipped row, so relative
+page costs match the real service.
+
+Supported query features: equality, `$any`, `$all`, `$not`, `$exists`,
+`$notExists`, `$gt`/`$ge`/`$lt`/`$le` and `$is`; sort on one or more columns;
+column projection; `page.size`, `page.offset` and `page.after`; and `count`
+aggregates.
+"""
+import base64
+import bisect
+import copy
+import itertools
+import json
+
+
+class StubResponse(dict):
+    """Dict response with the ApiResponse helpers the routers use."""
+
+    def __init__(self, data=None, status_code=200, cursor=None, more=False):
+        super().__init__(data or {})
+        self.status_code = status_code
+        self._cursor = cursor
+        self._more = more
+
+    def is_success(self):
+        return 200 <= self.status_code < 300
+
+    def get_cursor(self):
+        return self._cursor
+
+    def has_more_results(self):
+        return self._more
+
+
+def _matches(record, condition):
+    if not isinstance(condition, dict):
+        return condition == record
+    for key, value in condition.items():
+        if key == "$all":
+            if not all(_matches(record, c) for c in (value if isinstance(value, list) else [value])):
+                return False
+        elif key == "$any":
+            if isinstance(value, list) and not any(_matches(record, c) for c in value):
+                return False
+        elif key == "$not":
+            if _matches(record, value):
+                return False
+        elif key == "$exists":
+            if record.get(value) in (None, ""):
+                return False
+        elif key == "$notExists":
+            if record.get(value) not in (None, ""):
+                return False
+        elif not _matches_column(record.get(key), value):
+            return False
+    return True
+
+
+def _matches_column(actual, condition):
+    if isinstance(actual, dict) and "id" in actual:
+        actual = actual["id"]
+    if not isinstance(condition, dict):
+        return actual == condition
+    for operator, expected in condition.items():
+        if operator == "$any":
+            if actual not in expected:
+                return False
+        elif operator == "$is":
+            if actual != expected:
+                return False
+        elif operator in ("$gt", "$ge", "$lt", "$le"):
+            if actual is None:
+                return False
+            if operator == "$gt" and not actual > expected:
+                return False
+            if operator == "$ge" and not actual >= expected:
+                return False
+            if operator == "$lt" and not actual < expected:
+                return False
+            if operator == "$le" and not actual <= expected:
+                return False
+        else:
+            raise ValueError(f"Unsupported filter operator {operator}")
+    return True
+
+
+def _sort_spec(sort):
+    if not sort:
+        return [("id", "asc")]
+    if isinstance(sort, dict):
+        sort = [sort]
+    spec = [next(iter(item.items())) for item in sort]
+    if spec[-1][0] != "id":
+        spec.append(("id", "asc"))
+    return spec
+
+
+def _sort_key(record, spec):
+    key = []
+    for column, direction in spec:
+        value = record.get(column)
+        if isinstance(value, dict) and "id" in value:
+            value = value["id"]
+        present = value is not None
+        # Missing values sort last; descending columns are stored negated via a wrapper
+        key.append((not present, _Desc(value) if direction == "desc" and present else value))
+    return tuple(key)
+
+
+class _Desc:
+    """Wrapper inverting comparison order for descending sort columns."""
+
+    __slots__ = ("value",)
+
+    def __init__(self, value):
+        self.value = value
+
+    def __lt__(self, other):
+        return self.value > other.value
+
+    def __gt__(self, other):
+        return self.value < other.value
+
+    def __eq__(self, other):
+        return self.value == other.value
+
+    def __le__(self, other):
+        return self.value >= other.value
+
+    def __ge__(self, other):
+        return self.value <= other.value
+
+
+def _encode_cursor(state):
+    return base64.urlsafe_b64encode(json.dumps(state).encode()).decode()
+
+
+def _decode_cursor(cursor):
+    return json.loads(base64.urlsafe_b64decode(cursor.encode()))
+
+
+class _Records:
+    def __init__(self, stub):
+        self.stub = stub
+
+    def get(self, table, record_id, **kwargs):
+        record = self.stub.tables.get(table, {}).get(record_id)
+        if record is None:
+            return StubResponse({"message": "record not found"}, status_code=404)
+        return StubResponse(copy.deepcopy(record))
+
+    def insert(self, table, record, **kwargs):
+        record_id = f"rec_{next(self.stub._ids):020d}"
+        self.stub.put(table, {**record, "id": record_id})
+        return StubResponse({"id": record_id}, status_code=201)
+
+    def update(self, table, record_id, fields, **kwargs):
+        record = self.stub.tables.get(table, {}).get(record_id)
+        if record is None:
+            return StubResponse({"message": "record not found"}, status_code=404)
+        self.stub.put(table, {**record, **fields})
+        return StubResponse({"id": record_id})
+
+    def transaction(self, payload, **kwargs):
+        results = []
+        for operation in payload.get("operations", []):
+            if "update" in operation:
+                update = operation["update"]
+                resp = self.update(update["table"], update["id"], update["fields"])
+            elif "insert" in operation:
+                insert = operation["insert"]
+                resp = self.insert(insert["table"], insert["record"])
+            else:
+                return StubResponse({"message": f"unsupported operation {operation}"}, status_code=400)
+            if not resp.is_success():
+                return StubResponse({"errors": [resp]}, status_code=400)
+            results.append(dict(resp))
+        return StubResponse({"results": results})
+
+
+class _Data:
+    def __init__(self, stub):
+        self.stub = stub
+
+    def query(self, table, payload=None, **kwargs):
+        payload = payload or {}
+        page = payload.get("page", {})
+        size = page.get("size", 20)
+
+        if page.get("after"):
+            state = _decode_cursor(page["after"])
+            position = None
+        else:
+            state = {"filter": payload.get("filter", {}), "sort": payload.get("sort"), "last": None}
+            position = page.get("offset", 0)
+
+        spec = _sort_spec(state["sort"])
+        index = self.stub.index(table, spec)
+        start = 0
+        if state["last"] is not None:
+            # Sort keys end with the record id, so they are unique; seek past the last one
+            start = bisect.bisect_right(index, (_sort_key(state["last"], spec), "\U0010ffff"))
+
+        records, skipped = [], 0
+        for position_in_index in range(start, len(index)):
+            record = self.stub.tables[table][index[position_in_index][1]]
+            if not _matches(record, state["filter"]):
+                continue
+            if position and skipped < position:
+                skipped += 1
+                continue
+            records.append(record)
+            if len(records) > size:
+                break
+
+        more = len(records) > size
+        records = records[:size]
+
+        cursor = None
+        if records:
+            last_values = {column: records[-1].get(column) for column, _ in spec}
+            cursor = _encode_cursor({"filter": state["filter"], "sort": state["sort"], "last": last_values})
+
+        columns = payload.get("columns")
+        if columns:
+            records = [{c: copy.deepcopy(r.get(c)) for c in columns if c in r} for r in records]
+        else:
+            records = [copy.deepcopy(r) for r in records]
+        return StubResponse(
+            {"records": records, "meta": {"page": {"cursor": cursor, "more": more, "size": size}}},
+            cursor=cursor,
+            more=more,
+        )
+
+    def aggregate(self, table, payload, **kwargs):
+        condition = payload.get("filter", {})
+        matching = sum(1 for r in self.stub.tables.get(table, {}).values() if _matches(r, condition))
+        return StubResponse({"aggs": {name: matching for name, agg in payload.get("aggs", {}).items() if "count" in agg}})
+
+
+class StubXataClient:
+    """
+    In-memory XataClient replacement exposing `records()` and `data()`.
+
+    Args:
+        tables (dict, optional): {table: [records]} to start with
+    """
+
+    def __init__(self, tables=None):
+        self.tables = {}
+        self._indexes = {}
+        self._ids = itertools.count(1)
+        for table, records in (tables or {}).items():
+            for record in records:
+                self.put(table, record)
+
+    def put(self, table, record):
+        """Insert or replace a record (it must have an `id`)."""
+        self.tables.setdefault(table, {})[record["id"]] = record
+        self._indexes = {k: v for k, v in self._indexes.items() if k[0] != table}
+
+    def index(self, table, spec):
+        """Sorted list of (sort key, record id) for a table and sort spec, built on first use."""
+        key = (table, tuple(spec))
+        if key not in self._indexes:
+            self._indexes[key] = sorted(
+                (_sort_key(record, spec), record_id) for record_id, record in self.tables.get(table, {}).items()
+            )
+        return self._indexes[key]
+
+    def records(self):
+        return _Records(self)
+
+    def data(self):
+        return _Data(self)
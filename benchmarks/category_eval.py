@@ -0,0 +1,210 @@
+"""
+Offline quality-vs-latency evaluation of `fetch_category` parameters.
+
+Replays a labelled corpus against a local or recorded copy of the category
+collection, sweeping alpha, limit, reranking and the rerank property, and
+reports top-1/top-k accuracy against `concat_Grievance_Category`, latency
+percentiles and bytes per query for every configuration.
+
+Corpus format (JSON lines):
+    {"text": "grievance text", "expected_category": "A >> B >> C"}
+
+Collection sources (pick one):
+    --collection categories.json   local copy written by --export (no network);
+                                   latencies are from a local TF-IDF stand-in,
+                                   not Weaviate, so use it for accuracy only
+    --replay recording.json        responses recorded with --record (no network);
+                                   queries missing from the recording are
+                                   counted and make the run exit with status 1
+    --record recording.json        query live Weaviate and record the responses
+    --export categories.json       dump the live collection and exit
+
+Examples:
+    python -m benchmarks.category_eval --corpus labelled.jsonl --collection categories.json
+    python -m benchmarks.category_eval --corpus labelled.jsonl --replay recording.json --fail-below 0.8
+"""
+import argparse
+import itertools
+import json
+import statistics
+import sys
+from app.utils.grievance_utils import fetch_category, initialize_client
+from app.utils.local_collection import (
+    LocalCategoryCollection,
+    RecordingCollection,
+    MissingRecordingError,
+    ReplayCollection,
+    export_collection,
+)
+
+# Parameters currently used in production by fetch_category
+BASELINE = {"alpha": 1.0, "limit": 10, "rerank": True, "rerank_prop": "description_of_Grievance_Category"}
+
+
+def _normalize(category):
+    return " ".join((category or "").lower().split())
+
+
+def _percentile(values, percent):
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, round(percent / 100 * len(ordered)) - 1))
+    return ordered[index]
+
+
+def load_corpus(path):
+    with open(path) as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def evaluate(corpus, collection, config, k):
+    """
+    Run the corpus through fetch_category with one configuration.
+
+    Queries without a recorded response are counted as `missing` and left
+    out of the accuracy and latency figures; any other search error is raised.
+
+    Returns:
+        dict: Accuracy, latency percentiles (ms) and mean bytes for the configuration
+    """
+    top1 = topk = missing = 0
+    latencies, sizes = [], []
+    for item in corpus:
+        collection.last_call = None
+        try:
+            results = fetch_category(item["text"], target_collection=collection, raise_errors=True, **config)
+        except MissingRecordingError:
+            missing += 1
+            continue
+        expected = _normalize(item["expected_category"])
+        ranked = [_normalize(r.get("concat_grievance_category")) for r in results]
+        top1 += bool(ranked) and ranked[0] == expected
+        topk += expected in ranked[:k]
+        if collection.last_call:
+            latencies.append(collection.last_call["latency"] * 1000)
+            sizes.append(collection.last_call["bytes"])
+
+    total = (len(corpus) - missing) or 1
+    return {
+        **config,
+        "top1": top1 / total,
+        f"top{k}": topk / total,
+        "missing": missing,
+        "p50_ms": _percentile(latencies, 50) if latencies else 0.0,
+        "p95_ms": _percentile(latencies, 95) if latencies else 0.0,
+        "p99_ms": _percentile(latencies, 99) if latencies else 0.0,
+        "mean_bytes": statistics.mean(sizes) if sizes else 0,
+    }
+
+
+def sweep(args):
+    configs = [BASELINE]
+    for alpha, limit, rerank, prop in itertools.product(args.alphas, args.limits, args.rerank, args.rerank_props):
+        config = {"alpha": alpha, "limit": limit, "rerank": rerank, "rerank_prop": prop}
+        # The rerank property is irrelevant without reranking
+        if not rerank and prop != args.rerank_props[0]:
+            continue
+        if config not in configs:
+            configs.append(config)
+    return configs
+
+
+def print_report(results, k):
+    header = (f"{'alpha':>5} {'limit':>5} {'rerank':<36} {'top1':>6} {'top' + str(k):>6} "
+              f"{'p50ms':>8} {'p95ms':>8} {'p99ms':>8} {'bytes':>8} {'missing':>7}")
+    print(header)
+    print("-" * len(header))
+    for r in results:
+        rerank = r["rerank_prop"] if r["rerank"] else "-"
+        print(f"{r['alpha']:>5} {r['limit']:>5} {rerank:<36} {r['top1']:>6.3f} {r[f'top{k}']:>6.3f} "
+              f"{r['p50_ms']:>8.2f} {r['p95_ms']:>8.2f} {r['p99_ms']:>8.2f} {r['mean_bytes']:>8.0f} {r['missing']:>7}")
+
+
+def recommend(results):
+    """
+    Fastest configuration (by p95) whose top-1 accuracy is at least the baseline's.
+
+    Configurations with missing recordings are not considered, and there is
+    no recommendation if the baseline itself has any.
+    """
+    baseline = results[0]
+    if baseline["missing"]:
+        return None
+    eligible = [r for r in results if not r["missing"] and r["top1"] >= baseline["top1"]]
+    return min(eligible, key=lambda r: (r["p95_ms"], r["mean_bytes"]))
+
+
+def parse_args(argv):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    source = parser.add_mutually_exclusive_group(required=True)
+    source.add_argument("--collection", help="Local collection export (JSON)")
+    source.add_argument("--replay", help="Recorded responses to replay (JSON)")
+    source.add_argument("--record", help="Query live Weaviate and save the responses here")
+    source.add_argument("--export", help="Export the live collection to this file and exit")
+    parser.add_argument("--corpus", help="Labelled corpus (JSON lines)")
+    parser.add_argument("--alphas", type=lambda s: [float(x) for x in s.split(",")], default=[0.0, 0.25, 0.5, 0.75, 1.0])
+    parser.add_argument("--limits", type=lambda s: [int(x) for x in s.split(",")], default=[5, 10])
+    parser.add_argument("--rerank", type=lambda s: [x.strip() == "on" for x in s.split(",")], default=[True, False],
+                        help="Comma-separated on/off values (default: on,off)")
+    parser.add_argument("--rerank-props", type=lambda s: s.split(","),
+                        default=["description_of_Grievance_Category", "concat_Grievance_Category"])
+    parser.add_argument("--k", type=int, default=3, help="k for top-k accuracy")
+    parser.add_argument("--json", help="Also write the results to this file")
+    parser.add_argument("--fail-below", type=float,
+                        help="Exit with status 1 if the baseline top-1 accuracy is below this value")
+    args = parser.parse_args(argv)
+    if not args.export and not args.corpus:
+        parser.error("--corpus is required unless --export is used")
+    return args
+
+
+def main(argv=None):
+    args = parse_args(argv)
+
+    if args.export:
+        _, live_collection = initialize_client()
+        print(f"Exported {export_collection(live_collection, args.export)} categories to {args.export}")
+        return 0
+
+    if args.collection:
+        collection = LocalCategoryCollection.load(args.collection)
+    elif args.replay:
+        collection = ReplayCollection.load(args.replay)
+    else:
+        _, live_collection = initialize_client()
+        collection = RecordingCollection(live_collection)
+
+    corpus = load_corpus(args.corpus)
+    results = [evaluate(corpus, collection, config, args.k) for config in sweep(args)]
+
+    if args.record:
+        collection.save(args.record)
+
+    print(f"{len(corpus)} grievances, {len(results)} configurations (first row is the current baseline)\n")
+    print_report(results, args.k)
+    best = recommend(results)
+    if best is None:
+        print("\nNo recommendation: the baseline has queries without a recorded response")
+    else:
+        print(f"\nFastest configuration keeping baseline top-1 accuracy: alpha={best['alpha']} limit={best['limit']} "
+              f"rerank={best['rerank_prop'] if best['rerank'] else 'off'} (top1={best['top1']:.3f}, p95={best['p95_ms']:.2f} ms)")
+    if args.collection:
+        print("Note: --collection latencies come from the local TF-IDF stand-in, not Weaviate; "
+              "only trust the recommendation when run with --replay")
+
+    missing = sum(r["missing"] for r in results)
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(results, f, indent=2)
+
+    if missing:
+        print(f"{missing} queries had no recorded response; re-record with --record to cover the whole sweep")
+        return 1
+    if args.fail_below is not None and results[0]["top1"] < args.fail_below:
+        print(f"Baseline top-1 accuracy {results[0]['top1']:.3f} is below {args.fail_below}")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,113 @@
+"""
+Benchmark officer queue page latency against an in-memory stub dataset.
+
+Pages through GET /grievances/queue with cursors and compares the per-page
+latency with offset pagination over the same filter and sort, at increasing
+page depths. No network access is needed.
+
+Run with:
+    python -m benchmarks.officer_queue [--grievances 200000] [--size 50]
+"""
+import argparse
+import os
+import random
+import time
+from datetime import datetime, timedelta
+
+# The routers create a XataClient at import; the stub replaces it before use
+os.environ.setdefault("XATA_API_KEY", "stub")
+os.environ.setdefault("XATA_DATABASE_URL", "https://stub-abc123.us-east-1.xata.sh/db/stub")
+
+from fastapi.testclient import TestClient
+from app.main import app
+from app.dependencies import verify_token
+from app.models.grievance_models import STATUS_OPTIONS
+from app.routers import grievances
+from app.utils.xata_stub import StubXataClient
+
+REPORT_PAGES = [1, 10, 100, 250, 500]
+QUEUE_FILTER = {"status": ["pending", "Active"], "priority": ["high", "critical"]}
+
+
+def build_dataset(count):
+    random.seed(7)
+    now = datetime.now()
+    records = []
+    for i in range(count):
+        received = now - timedelta(minutes=random.randint(0, 60 * 24 * 365))
+        records.append({
+            "id": f"rec_{i:020d}",
+            "title": f"Grievance {i}",
+            "description": "lorem ipsum " * 40,
+            "status": random.choice(STATUS_OPTIONS + ["pending"]),
+            "priority": random.choice(["low", "medium", "high", "critical"]),
+            "cpgrams_category": random.choice(["Pension", "Banking", "Railways", "Telecom"]),
+            "grievance_received_date": received.strftime("%Y-%m-%dT%H:%M:%S.%fZ"),
+            "user_id": f"user_{i % 5000}",
+        })
+    return StubXataClient({"Grievance": records})
+
+
+def cursor_pages(client, size, pages):
+    timings = {}
+    cursor = None
+    params = [("status", s) for s in QUEUE_FILTER["status"]] + [("priority", p) for p in QUEUE_FILTER["priority"]]
+    for page in range(1, pages + 1):
+        query = [("size", size)] + ([("cursor", cursor)] if cursor else params)
+        started = time.perf_counter()
+        body = client.get("/grievances/queue", params=query).json()
+        elapsed = (time.perf_counter() - started) * 1000
+        if page in REPORT_PAGES:
+            timings[page] = (body["took_ms"], elapsed)
+        cursor = body["next_cursor"]
+        if cursor is None:
+            break
+    return timings
+
+
+def offset_pages(stub, size, pages):
+    timings = {}
+    for page in REPORT_PAGES:
+        if page > pages:
+            break
+        query = {
+            "columns": ["id", "title", "status", "priority", "cpgrams_category", "grievance_received_date", "user_id"],
+            "filter": {"status": {"$any": QUEUE_FILTER["status"]}, "priority": {"$any": QUEUE_FILTER["priority"]}},
+            "sort": [{"grievance_received_date": "asc"}, {"id": "asc"}],
+            "page": {"size": size, "offset": (page - 1) * size},
+        }
+        started = time.perf_counter()
+        stub.data().query("Grievance", query)
+        timings[page] = (time.perf_counter() - started) * 1000
+    return timings
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Officer queue pagination benchmark")
+    parser.add_argument("--grievances", type=int, default=200000)
+    parser.add_argument("--size", type=int, default=50)
+    parser.add_argument("--pages", type=int, default=500)
+    args = parser.parse_args()
+
+    print(f"Building stub dataset with {args.grievances} grievances...")
+    stub = build_dataset(args.grievances)
+    grievances.xata = stub
+    app.dependency_overrides[verify_token] = lambda: "benchmark"
+
+    with TestClient(app) as client:
+        # Build the sort index outside the measurements
+        client.get("/grievances/queue", params={"size": 1})
+        cursor = cursor_pages(client, args.size, args.pages)
+    offset = offset_pages(stub, args.size, args.pages)
+
+    print(f"\npage size {args.size}, filter {QUEUE_FILTER}")
+    print(f"{'page':>6} {'cursor query ms':>16} {'cursor request ms':>18} {'offset query ms':>16}")
+    for page in REPORT_PAGES:
+        if page not in cursor:
+            continue
+        query_ms, request_ms = cursor[page]
+        print(f"{page:>6} {query_ms:>16.2f} {request_ms:>18.2f} {offset.get(page, float('nan')):>16.2f}")
+
+
+if __name__ == "__main__":
+    main()
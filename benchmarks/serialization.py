@@ -0,0 +1,179 @@
+"""
+Benchmark response serialization and compression for the largest payloads.
+
+Serves the same synthetic payload through FastAPI with TestClient twice: once
+from a route declared `response_model=dict`, as /category/ was before, and
+once from a route declaring the response model it now uses. Both go through
+FastAPI's own serialization (including its Pydantic dump_json fast path where
+the installed version has one), so the timings are what a request pays, not an
+approximation. GET /grievances/user/{user_id} still returns a dict, so its
+section only measures compression. Bytes on the wire are reported with and
+without CompressionMiddleware. No network access or credentials are needed.
+
+Run with:
+    python -m benchmarks.serialization
+"""
+import json
+import os
+import random
+import string
+import time
+
+# The routers create a XataClient at import; nothing here talks to it
+os.environ.setdefault("XATA_API_KEY", "stub")
+os.environ.setdefault("XATA_DATABASE_URL", "https://stub-abc123.us-east-1.xata.sh/db/stub")
+
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from app.middleware import CompressionMiddleware, brotli
+from app.routers import category
+
+ITERATIONS = 200
+
+
+def _text(words):
+    return " ".join("".join(random.choices(string.ascii_lowercase, k=random.randint(3, 10))) for _ in range(words))
+
+
+def _form_fields():
+    fields = []
+    for i in range(12):
+        fields.append({
+            "field_name": f"field_{i}",
+            "data_type": random.choice(["text", "date", "number", "dropdown"]),
+            "mandatory": random.choice([True, False]),
+            "description": _text(25),
+            "options": [_text(2) for _ in range(4)],
+        })
+    return json.dumps(fields)[1:-1]
+
+
+def categorize_payload():
+    categories = []
+    for i in range(1, 11):
+        description = _text(60)
+        categories.append({
+            "rank": i,
+            "score": random.random(),
+            "rerank_score": random.random(),
+            "id": f"{i:08d}-0000-0000-0000-000000000000",
+            "concat_grievance_category": " >> ".join(_text(3) for _ in range(4)),
+            "content": description,
+            "department_code": "DOPPW",
+            "department_name": _text(4),
+            "category": _text(3),
+            "sub_category_1": _text(3),
+            "sub_category_2": _text(3),
+            "sub_category_3": _text(3),
+            "sub_category_4": None,
+            "sub_category_5": None,
+            "sub_category_6": None,
+            "description_of_grievance_category": description,
+            "gpt_form_field_generation": _form_fields(),
+        })
+    return {
+        "status": "success",
+        "categories": categories,
+        "top_category": categories[0],
+        "formatted_fields": _text(200),
+        "classified_category": categories[0]["concat_grievance_category"],
+    }
+
+
+def user_grievances_payload(records=200):
+    grievances = []
+    for i in range(records):
+        grievance = {
+            "id": f"rec_{i:020d}",
+            "title": _text(6),
+            "description": _text(120),
+            "category": _text(2),
+            "priority": "medium",
+            "user_id": {"id": "rec_user"},
+            "status": "pending",
+            "created_at": "2025-05-15T03:17:32.960289Z",
+            "updated_at": "2025-05-15T03:17:32.960289Z",
+            "xata": {"createdAt": "2025-05-15T03:17:32.960289Z", "version": 1},
+        }
+        for j in range(30):
+            grievance[f"extra_field_{j}"] = _text(3) if j % 3 else None
+        grievances.append(grievance)
+    return {"status": "success", "user_id": "rec_user", "grievances": grievances, "total": records}
+
+
+def route_response_model(router, path, method):
+    """The response model and its options declared by a real route."""
+    for route in router.routes:
+        if route.path == path and method in route.methods:
+            return route.response_model, {"response_model_exclude_unset": route.response_model_exclude_unset}
+    raise LookupError(f"{method} {path} not found")
+
+
+def payload_app(payload, response_model, compress=False, **route_kwargs):
+    """An app with one GET route returning `payload` as `response_model`."""
+    app = FastAPI()
+    if compress:
+        app.add_middleware(CompressionMiddleware, minimum_size=1024)
+
+    @app.get("/", response_model=response_model, **route_kwargs)
+    async def serve():
+        return payload
+    return app
+
+
+def time_requests(client, headers):
+    client.get("/", headers=headers)
+    started = time.perf_counter()
+    for _ in range(ITERATIONS):
+        response = client.get("/", headers=headers)
+    return (time.perf_counter() - started) / ITERATIONS * 1000, response
+
+
+def report(name, payload, method, router=None):
+    """
+    Time `payload` served as dict and as the response model of `router`'s
+    route `name`, then compressed. Without a router only compression is
+    measured, for routes that still return a dict.
+    """
+    identity = {"Accept-Encoding": "identity"}
+
+    if router is None:
+        response_model, route_kwargs = dict, {}
+        with TestClient(payload_app(payload, dict)) as client:
+            after_ms, after = time_requests(client, identity)
+        print(f"\n{method} {name} (compression only, route returns a dict)")
+        print(f"  request, response_model=dict      : {after_ms:8.3f} ms")
+    else:
+        response_model, route_kwargs = route_response_model(router, name, method)
+        with TestClient(payload_app(payload, dict)) as client:
+            before_ms, before = time_requests(client, identity)
+        with TestClient(payload_app(payload, response_model, **route_kwargs)) as client:
+            after_ms, after = time_requests(client, identity)
+        assert json.loads(before.content) == json.loads(after.content) or route_kwargs["response_model_exclude_unset"]
+
+        print(f"\n{method} {name}")
+        print(f"  request, response_model=dict      : {before_ms:8.3f} ms")
+        print(f"  request, {response_model.__name__:<25}: {after_ms:8.3f} ms  ({before_ms / after_ms:.2f}x)")
+    print(f"  bytes uncompressed                : {len(after.content):8d}")
+
+    with TestClient(payload_app(payload, response_model, compress=True, **route_kwargs)) as client:
+        for encoding, label in (("gzip", "gzip (level 6)"), ("br", "brotli (q 4)")):
+            if encoding == "br" and brotli is None:
+                print("  brotli                            : (brotli not installed)")
+                continue
+            compressed_ms, response = time_requests(client, {"Accept-Encoding": encoding})
+            # httpx decodes the body; Content-Length is the size on the wire
+            body = response.content
+            size = int(response.headers["content-length"])
+            print(f"  request + {label:<24}: {compressed_ms:8.3f} ms, {size:8d} bytes "
+                  f"({len(body) / size:.1f}x smaller)")
+
+
+def main():
+    random.seed(42)
+    report("/category/", categorize_payload(), "POST", category.router)
+    report("/grievances/user/{user_id}", user_grievances_payload(), "GET")
+
+
+if __name__ == "__main__":
+    main()
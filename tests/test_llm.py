@@ -0,0 +1,189 @@
+"""
+Tests for the LLM prompt budgeting, model routing and call statistics.
+
+The functions under test talk to a small OpenAI-compatible server started on
+localhost and reached through OPENAI_BASE_URL, so no real API key or network
+access is needed.
+"""
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import pytest
+from app.utils import grievance_utils, llm
+
+PROMPT_TOKENS = 321
+COMPLETION_TOKENS = 12
+
+
+class FakeOpenAIHandler(BaseHTTPRequestHandler):
+    """Answers chat completions with a tool call for the requested response model."""
+
+    requests = []
+
+    def log_message(self, format, *args):
+        pass
+
+    def do_POST(self):
+        body = json.loads(self.rfile.read(int(self.headers["content-length"])))
+        self.requests.append(body)
+
+        tool = body["tools"][0]["function"]["name"]
+        if tool == "FollowUpQuestions":
+            arguments = {"is_correct_category": True, "missing_information": True,
+                         "follow_up_questions": ["When did it happen?"]}
+        else:
+            arguments = {"answered_question_numbers": [1]}
+        completion = {
+            "id": "chatcmpl-test",
+            "object": "chat.completion",
+            "created": 0,
+            "model": body["model"],
+            "choices": [{
+                "index": 0,
+                "finish_reason": "tool_calls",
+                "message": {
+                    "role": "assistant",
+                    "content": None,
+                    "tool_calls": [{"id": "call_1", "type": "function",
+                                    "function": {"name": tool, "arguments": json.dumps(arguments)}}],
+                },
+            }],
+            "usage": {"prompt_tokens": PROMPT_TOKENS, "completion_tokens": COMPLETION_TOKENS,
+                      "total_tokens": PROMPT_TOKENS + COMPLETION_TOKENS},
+        }
+
+        data = json.dumps(completion).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+
+@pytest.fixture(scope="module")
+def fake_openai():
+    server = ThreadingHTTPServer(("127.0.0.1", 0), FakeOpenAIHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    monkeypatch = pytest.MonkeyPatch()
+    monkeypatch.setenv("OPENAI_BASE_URL", f"http://127.0.0.1:{server.server_address[1]}/v1")
+    monkeypatch.setenv("OPENAI_API_KEY", "test-key")
+    # The shared client is created lazily and reads OPENAI_BASE_URL then
+    monkeypatch.setattr(llm, "_ins_client", None)
+    yield FakeOpenAIHandler.requests
+    monkeypatch.undo()
+    server.shutdown()
+    server.server_close()
+
+
+@pytest.fixture(autouse=True)
+def reset_stats(fake_openai):
+    fake_openai.clear()
+    with llm._stats_lock:
+        llm._call_stats.clear()
+        llm._recent_calls.clear()
+
+
+def _form_fields(count):
+    fields = [
+        {"field_name": f"field_{i}", "data_type": "text", "mandatory": True,
+         "description": "Details the department needs to process the grievance " * 5, "options": ["yes", "no"]}
+        for i in range(count)
+    ]
+    # Stored like the category collection does: the list without its brackets
+    return json.dumps(fields)[1:-1]
+
+
+def _category(confidence, fields=3):
+    return {
+        "concat_grievance_category": "Roads >> Maintenance >> Potholes",
+        "department_name": "Public Works",
+        "description_of_grievance_category": "Damaged or unsafe public roads",
+        "rerank_score": confidence,
+        "gpt_form_field_generation": _form_fields(fields),
+    }
+
+
+def _user_prompt(request):
+    return next(m["content"] for m in request["messages"] if m["role"] == "user")
+
+
+def test_choose_model_escalates_only_when_needed():
+    assert llm.choose_model(10, 0.9) == llm.LLM_FAST_MODEL
+    assert llm.choose_model(10, None) == llm.LLM_FAST_MODEL
+    assert llm.choose_model(10, llm.LLM_ESCALATE_BELOW_CONFIDENCE / 2) == llm.LLM_STRONG_MODEL
+    assert llm.choose_model(llm.LLM_ESCALATE_ABOVE_TOKENS + 1, 0.9) == llm.LLM_STRONG_MODEL
+
+
+def test_follow_up_questions_use_fast_model_for_confident_short_cases(fake_openai):
+    result = grievance_utils.generate_follow_up_questions("The road outside my house has a pothole.", _category(0.9), "")
+
+    assert result.follow_up_questions == ["When did it happen?"]
+    assert len(fake_openai) == 1
+    assert fake_openai[0]["model"] == llm.LLM_FAST_MODEL
+    assert "field_0 (text, required) [yes | no]" in _user_prompt(fake_openai[0])
+
+
+def test_follow_up_questions_escalate_low_confidence_category(fake_openai):
+    grievance_utils.generate_follow_up_questions("The road outside my house has a pothole.", _category(0.1), "")
+
+    assert fake_openai[0]["model"] == llm.LLM_STRONG_MODEL
+
+
+def test_follow_up_prompt_is_truncated_to_budget(fake_openai):
+    grievance = "The road outside my house has been broken for months. " * 400
+    category = _category(0.9, fields=80)
+    assert llm.count_tokens(grievance) + llm.count_tokens(category["gpt_form_field_generation"]) > llm.LLM_PROMPT_TOKEN_BUDGET
+
+    grievance_utils.generate_follow_up_questions(grievance, category, "")
+
+    prompt = _user_prompt(fake_openai[0])
+    model = fake_openai[0]["model"]
+    assert model == llm.LLM_STRONG_MODEL
+    assert llm.count_tokens(prompt, model) <= llm.LLM_PROMPT_TOKEN_BUDGET
+    # Both the start and the end of the grievance survive truncation
+    assert "[...]" in prompt
+    assert "The road outside my house" in prompt
+
+
+def test_verify_open_questions_fast_model_for_short_answer(fake_openai):
+    result = grievance_utils.verify_open_questions(["When did it happen?", "Where exactly?"], "Last Monday.")
+
+    assert result.answered_question_numbers == [1]
+    assert fake_openai[0]["model"] == llm.LLM_FAST_MODEL
+    prompt = _user_prompt(fake_openai[0])
+    assert "1. When did it happen?" in prompt and "2. Where exactly?" in prompt
+
+
+def test_verify_open_questions_escalates_and_truncates_long_answer(fake_openai):
+    answer = "It happened last Monday near the market, and nobody has come to repair it. " * 300
+
+    grievance_utils.verify_open_questions(["When did it happen?"], answer)
+
+    prompt = _user_prompt(fake_openai[0])
+    model = fake_openai[0]["model"]
+    assert model == llm.LLM_STRONG_MODEL
+    assert llm.count_tokens(prompt, model) <= llm.LLM_PROMPT_TOKEN_BUDGET
+    assert "[...]" in prompt
+
+
+def test_calls_are_recorded_in_stats(fake_openai):
+    grievance_utils.generate_follow_up_questions("The road outside my house has a pothole.", _category(0.9), "")
+    grievance_utils.verify_open_questions(["When did it happen?"], "Last Monday.")
+    grievance_utils.verify_open_questions(["When did it happen?"], "Yesterday.")
+
+    stats = llm.llm_stats()
+    calls = {(c["kind"], c["model"]): c for c in stats["calls"]}
+    follow_up = calls[("generate_follow_up_questions", llm.LLM_FAST_MODEL)]
+    verify = calls[("verify_open_questions", llm.LLM_FAST_MODEL)]
+
+    assert follow_up["calls"] == 1
+    assert verify["calls"] == 2
+    # Token counts come from the usage the endpoint reported
+    assert verify["prompt_tokens"] == 2 * PROMPT_TOKENS
+    assert verify["completion_tokens"] == 2 * COMPLETION_TOKENS
+    assert verify["mean_prompt_tokens"] == PROMPT_TOKENS
+    assert verify["total_latency_seconds"] > 0
+    assert verify["max_latency_seconds"] <= verify["total_latency_seconds"]
+    assert [c["kind"] for c in stats["recent"]] == [
+        "generate_follow_up_questions", "verify_open_questions", "verify_open_questions",
+    ]